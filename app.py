@@ -1,44 +1,481 @@
 #!/usr/bin/env python3
 import os
+import sys
+import html
 import sqlite3
 import logging
+import threading
+import queue
+import time
+import heapq
+import zlib
+import csv
+import io
+import json
+import hashlib
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, Future, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import fcntl
+from itertools import islice
+from collections import OrderedDict, Counter as StackCounter
+from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException, ClientDisconnected
 import base64
 import pickle
-from datetime import datetime
+import socket
+import socketserver
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
 from pathlib import Path
 from functools import wraps
+import click
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess, REGISTRY)
 from flask import (Flask, flash, redirect, render_template_string, request,
-                   session, url_for, jsonify)
-import cv2
-import mediapipe as mp
+                   session, url_for, jsonify, stream_template_string,
+                   get_flashed_messages, stream_with_context, abort, g,
+                   has_request_context, make_response, Request)
 import numpy as np
 
 # App and DB config
 APP = Flask(__name__)
 APP.secret_key = os.environ.get("SVM_SECRET_KEY", "svm_demo_secret_key_change_me")
 BASE = Path(__file__).resolve().parent
-DB_PATH = BASE / "svm_admin.db"
+DB_PATH = Path(os.environ.get("SVM_DB_PATH", BASE / "svm_admin.db"))
+
+# Connection pool config (per gunicorn worker). A pool size of 0 disables
+# pooling and opens a fresh connection for every get_conn() call.
+DB_POOL_SIZE = int(os.environ.get("SVM_DB_POOL_SIZE", 8))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("SVM_DB_BUSY_TIMEOUT_MS", 5000))
+DB_CACHE_KIB = int(os.environ.get("SVM_DB_CACHE_KIB", 16384))
+DB_STATEMENT_CACHE = 256
+# Sharded storage: with N > 1 shards, voters and their votes are spread over
+# N database files (svm_admin.shard<i>.db) by a stable hash of voter_id.
+DB_SHARDS = max(int(os.environ.get("SVM_DB_SHARDS", 1)), 1)
+VOTER_CACHE_SIZE = int(os.environ.get("SVM_VOTER_CACHE_SIZE", 10000))
+FACE_MATCH_THRESHOLD = 0.4
+
+# Face preprocessing. FACE_DETECTOR_MODEL picks MediaPipe's short-range (0,
+# faces within ~2 m, suits booth kiosks) or full-range (1) detector.
+# FACE_DECODE_REDUCTION (1, 2, 4 or 8) decodes JPEGs at reduced resolution;
+# FACE_TARGET_SHORT_SIDE (0 = off) downscales frames whose short side is larger.
+FACE_DETECTOR_MODEL = int(os.environ.get("SVM_FACE_DETECTOR_MODEL", 1))
+FACE_DECODE_REDUCTION = int(os.environ.get("SVM_FACE_DECODE_REDUCTION", 1))
+FACE_TARGET_SHORT_SIDE = int(os.environ.get("SVM_FACE_TARGET_SHORT_SIDE", 0))
+FACE_MAX_UPLOAD_BYTES = int(os.environ.get("SVM_FACE_MAX_UPLOAD_BYTES", 4 * 1024 * 1024))
+FACE_MAX_BURST = int(os.environ.get("SVM_FACE_MAX_BURST", 5))
+# Bodies larger than the biggest face request (a JSON burst of base64 frames)
+# are refused by Werkzeug with 413 before they are read; roll uploads to
+# /admin/import get IMPORT_MAX_UPLOAD_BYTES instead (see BoothRequest).
+APP.config["MAX_CONTENT_LENGTH"] = FACE_MAX_BURST * (FACE_MAX_UPLOAD_BYTES * 4 // 3 + 4096)
+IMPORT_MAX_UPLOAD_BYTES = int(os.environ.get("SVM_IMPORT_MAX_UPLOAD_BYTES", 2 * 1024 ** 3))
+# Streaming verification (/api/verify_face/stream): frames are processed at
+# most FACE_STREAM_FPS per second per stream, for at most FACE_STREAM_TIMEOUT
+# seconds, and FACE_STREAM_SHORT_SIDE is the size the booth page sends.
+FACE_STREAM_FPS = float(os.environ.get("SVM_FACE_STREAM_FPS", 8))
+FACE_STREAM_TIMEOUT = float(os.environ.get("SVM_FACE_STREAM_TIMEOUT", 4))
+FACE_STREAM_SHORT_SIDE = int(os.environ.get("SVM_FACE_STREAM_SHORT_SIDE", 240))
+if FACE_STREAM_FPS <= 0:
+    raise ValueError(f"SVM_FACE_STREAM_FPS must be positive, not {FACE_STREAM_FPS}")
+FACE_ROI_MARGIN = 0.75
+
+# Shared inference service: when SVM_INFERENCE_SOCKET is set, web workers send
+# frames to `flask --app app inference-server` instead of running MediaPipe.
+INFERENCE_SOCKET = os.environ.get("SVM_INFERENCE_SOCKET")
+INFERENCE_WORKERS = int(os.environ.get("SVM_INFERENCE_WORKERS", 2))
+INFERENCE_MAX_BATCH = int(os.environ.get("SVM_INFERENCE_MAX_BATCH", 8))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("SVM_INFERENCE_MAX_WAIT_MS", 2))
+INFERENCE_TIMEOUT = float(os.environ.get("SVM_INFERENCE_TIMEOUT", 10))
+DUPLICATE_FACE_LIMIT = 5
+ADMIN_PAGE_SIZE = 100
+ADMIN_MAX_PAGE_SIZE = 500
+# FULL fsyncs every commit, so a vote is durable before it is acknowledged;
+# NORMAL (faster in WAL mode, but the last commits can be lost on power
+# failure) is only safe for read-only or throwaway deployments.
+DB_SYNCHRONOUS = os.environ.get("SVM_DB_SYNCHRONOUS", "FULL")
+
+# Admission control for the inference routes (per worker): at most
+# INFERENCE_CONCURRENCY requests run detection while up to INFERENCE_QUEUE
+# more wait, each for at most INFERENCE_QUEUE_TIMEOUT_MS; anything beyond
+# that gets a fast 503. With gunicorn's gthread workers this keeps threads
+# free for cheap calls such as /api/cast_vote. 0 concurrency disables it.
+INFERENCE_CONCURRENCY = int(os.environ.get("SVM_INFERENCE_CONCURRENCY", 1))
+INFERENCE_QUEUE = int(os.environ.get("SVM_INFERENCE_QUEUE", 2))
+INFERENCE_QUEUE_TIMEOUT_MS = float(os.environ.get("SVM_INFERENCE_QUEUE_TIMEOUT_MS", 1500))
+
+# Request tracing: traced routes return a Server-Timing header, and requests
+# slower than TRACE_SLOW_MS (negative disables) have their spans appended to
+# a per-worker rotating trace file in Chrome trace-event format.
+TRACE_SLOW_MS = float(os.environ.get("SVM_TRACE_SLOW_MS", 500))
+TRACE_DIR = Path(os.environ.get("SVM_TRACE_DIR", BASE / "traces"))
+TRACE_FILE_BYTES = int(os.environ.get("SVM_TRACE_FILE_BYTES", 5 * 1024 * 1024))
+TRACE_BACKUPS = int(os.environ.get("SVM_TRACE_BACKUPS", 3))
+
+# Admin sampling profiler (/admin/profile): hard cap on one profiling run.
+PROFILE_MAX_SECONDS = float(os.environ.get("SVM_PROFILE_MAX_SECONDS", 60))
+
+# Startup profile. "booth" workers warm the face detector right after fork
+# (see gunicorn.conf.py) and only report ready once it has run; "admin"
+# workers never touch the vision stack, so cv2/MediaPipe are never imported.
+PROFILE = os.environ.get("SVM_PROFILE", "booth")
+
+# Group commit: when enabled, cast requests are queued and committed in
+# batches by one writer thread per worker (bounded by size and latency).
+GROUP_COMMIT = os.environ.get("SVM_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("SVM_GROUP_COMMIT_MAX_BATCH", 64))
+GROUP_COMMIT_MAX_WAIT_MS = float(os.environ.get("SVM_GROUP_COMMIT_MAX_WAIT_MS", 5))
+# How long a cast request waits for its batch before answering 503.
+GROUP_COMMIT_TIMEOUT = float(os.environ.get("SVM_GROUP_COMMIT_TIMEOUT", 10))
 
 # Admin credentials
 ADMIN_USER = "poomalai005"
 ADMIN_PASS = "Poomalai2005@"
 
-# Set up basic logging
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+# Logging: request threads only enqueue records; a listener thread formats
+# them (JSON lines by default, SVM_LOG_FORMAT=text for the old format) and
+# writes them to stderr. Per-request success messages (log_success) are rate
+# limited to SVM_LOG_SUCCESS_RATE per second per kind (0 = unlimited).
+LOG_FORMAT = os.environ.get("SVM_LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.environ.get("SVM_LOG_QUEUE_SIZE", 10000))
+LOG_SUCCESS_RATE = float(os.environ.get("SVM_LOG_SUCCESS_RATE", 5))
+
+# --- Metrics ---
+# Exposed at /metrics in Prometheus text format. Under gunicorn, the config
+# sets PROMETHEUS_MULTIPROC_DIR before workers fork, so every worker writes
+# its samples to memory-mapped files there and /metrics sums all of them.
+STAGE_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+REQUESTS = Counter("svm_http_requests_total", "HTTP requests by route, method and status.",
+                   ["route", "method", "status"])
+REQUEST_SECONDS = Histogram("svm_http_request_duration_seconds", "Time to produce a response, by route.",
+                            ["route"], buckets=STAGE_BUCKETS + (5, 10))
+STAGE_SECONDS = Histogram("svm_stage_duration_seconds", "Time spent in internal request stages.",
+                          ["stage"], buckets=STAGE_BUCKETS)
+VERIFICATIONS = Counter("svm_verifications_total", "Voter verification attempts by step and outcome.",
+                        ["step", "outcome"])
+DB_BUSY = Counter("svm_db_busy_total", "SQLite operations that failed with database locked/busy.")
+VOTES = Counter("svm_votes_total", "Vote cast attempts by result.", ["result"])
+INFERENCE_SHED = Counter("svm_inference_shed_total", "Face requests rejected by admission control.")
+# livesum: summed over the workers that are alive, so a dead worker's last value drops out.
+INFERENCE_QUEUE_DEPTH = Gauge("svm_inference_queue_depth", "Face requests waiting for an inference slot.",
+                              multiprocess_mode="livesum")
+INFERENCE_IN_FLIGHT = Gauge("svm_inference_in_flight", "Face requests holding an inference slot.",
+                            multiprocess_mode="livesum")
+
+class RequestTrace:
+    """Spans recorded during one traced request, as (name, start, end, depth) perf_counter pairs."""
+    def __init__(self, name):
+        self.name = name
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.depth = 0
+        self.spans = []
+
+    def server_timing(self, total):
+        """Server-Timing header value: summed duration per stage plus the total, in ms."""
+        durations = {}
+        for name, start, end, _ in self.spans:
+            durations[name] = durations.get(name, 0.0) + end - start
+        parts = [f"{name};dur={secs * 1000:.2f}" for name, secs in durations.items()]
+        return ", ".join(parts + [f"total;dur={total * 1000:.2f}"])
+
+    def events(self, end, args):
+        """The request and its spans as Chrome trace-event 'complete' events."""
+        pid, tid = os.getpid(), threading.get_ident()
+        to_us = lambda t: round((self.wall_start + t - self.start) * 1e6)
+        events = [{"name": self.name, "ph": "X", "ts": to_us(self.start), "dur": to_us(end) - to_us(self.start),
+                   "pid": pid, "tid": tid, "args": args}]
+        events.extend({"name": name, "ph": "X", "ts": to_us(start), "dur": to_us(stop) - to_us(start),
+                       "pid": pid, "tid": tid, "args": {"depth": depth}}
+                      for name, start, stop, depth in self.spans)
+        return events
+
+class stage:
+    """
+    Context manager timing one internal stage into svm_stage_duration_seconds
+    and, inside a traced request, recording it as a span.
+    """
+    __slots__ = ("name", "start", "trace")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = g.get("trace") if has_request_context() else None
+        if self.trace is not None:
+            self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        STAGE_SECONDS.labels(self.name).observe(end - self.start)
+        if self.trace is not None:
+            self.trace.depth -= 1
+            self.trace.spans.append((self.name, self.start, end, self.trace.depth))
+
+LOG_DROPPED = Counter("svm_log_dropped_total", "Log records not written, by reason.", ["reason"])
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields given to the log call are included."""
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                 "level": record.levelname, "logger": record.name, "msg": record.getMessage(),
+                 "pid": record.process, "thread": record.threadName}
+        entry.update((k, v) for k, v in vars(record).items() if k not in self.RESERVED)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LogRateLimit:
+    """
+    Token bucket per message kind: allow() admits at most `rate` messages per
+    second for a kind, returning how many were suppressed since the last one
+    admitted, or None (counted in svm_log_dropped_total) to suppress this one.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._dropped = LOG_DROPPED.labels("rate_limited")
+
+    def allow(self, key):
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.rate, now, 0))
+            tokens = min(self.rate, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                self._dropped.inc()
+                return None
+            self._buckets[key] = (tokens - 1, now, 0)
+        return suppressed
+
+_success_log_limit = LogRateLimit(LOG_SUCCESS_RATE)
+
+def log_success(kind, msg, *args):
+    """
+    Logs a per-request success message at INFO, rate limited per `kind`;
+    suppressed messages never build a record, and the next one admitted
+    carries their count as `suppressed`.
+    """
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+    suppressed = _success_log_limit.allow(kind)
+    if suppressed is not None:
+        logging.info(msg, *args, extra={"kind": kind, "suppressed": suppressed} if suppressed else {"kind": kind})
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a QueueListener thread, which
+    (re)starts in whichever process logs first, e.g. each forked worker. A full
+    queue drops the record and counts it instead of blocking the request.
+    Formatting is left to the listener, so arguments are merged off-thread.
+    """
+    def __init__(self, maxsize, handler):
+        super().__init__(queue.Queue(maxsize))
+        self.target = handler
+        self._listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+        self._dropped = LOG_DROPPED.labels("queue_full")
+
+    def _ensure_listener(self):
+        with self._start_lock:
+            if self._listener_pid != os.getpid():
+                self.queue = queue.Queue(self.queue.maxsize)  # a copy inherited over fork has no reader
+                self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._listener_pid = os.getpid()
+                atexit.register(self._listener.stop)
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self._listener_pid != os.getpid():
+            self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._dropped.inc()
+
+def setup_logging():
+    """Routes the root logger through NonBlockingQueueHandler (idempotent)."""
+    root = logging.getLogger()
+    if any(isinstance(h, NonBlockingQueueHandler) for h in root.handlers):
+        return
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else
+                        logging.Formatter('[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    handler = NonBlockingQueueHandler(LOG_QUEUE_SIZE, stream)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+setup_logging()
+
+def count_db_error(e):
+    """Counts lock/busy failures among SQLite errors."""
+    if isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e)):
+        DB_BUSY.inc()
 
 # Ensure DB
-def get_conn():
-    """Returns a new database connection."""
-    conn = sqlite3.connect(str(DB_PATH))
+def shard_path(shard, shards=None):
+    """Database file holding the given shard (DB_PATH itself when unsharded)."""
+    if (shards or DB_SHARDS) == 1:
+        return DB_PATH
+    return DB_PATH.with_name(f"{DB_PATH.stem}.shard{shard}{DB_PATH.suffix}")
+
+def shard_for(voter_id):
+    """Shard index owning a voter; crc32 keeps it stable across processes."""
+    if DB_SHARDS == 1:
+        return 0
+    return zlib.crc32(voter_id.encode("utf-8")) % DB_SHARDS
+
+def _connect(shard=0):
+    """Opens a tuned SQLite connection (WAL journal, busy timeout, page cache)."""
+    conn = sqlite3.connect(str(shard_path(shard)), timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=DB_STATEMENT_CACHE, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
     return conn
 
+class PooledConnection:
+    """
+    Thin wrapper around a pooled sqlite3 connection.
+    close() hands the connection back to the pool instead of closing it, so
+    existing `conn = get_conn() ... conn.close()` call sites keep working.
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+class ConnectionPool:
+    """Per-process pool of idle SQLite connections to one shard, reset after fork."""
+    def __init__(self, size, shard=0):
+        self.size = size
+        self.shard = shard
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Connections must never be shared across a fork; drop the parent's.
+        if self._pid != os.getpid():
+            self._idle = []
+            self._pid = os.getpid()
+
+    def acquire(self):
+        with self._lock:
+            self._check_fork()
+            conn = self._idle.pop() if self._idle else None
+        return PooledConnection(self, conn or _connect(self.shard))
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            self._check_fork()
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+_pools = [ConnectionPool(DB_POOL_SIZE, shard) for shard in range(DB_SHARDS)]
+
+def get_conn(voter_id=None, shard=None):
+    """
+    Returns a database connection, reusing a pooled one when available.
+    Pass voter_id to reach the shard owning that voter, or shard to pick one
+    explicitly; with neither, the first shard is used.
+    """
+    if shard is None:
+        shard = shard_for(voter_id) if voter_id else 0
+    if DB_POOL_SIZE <= 0:
+        return _connect(shard)
+    return _pools[shard].acquire()
+
+# --- Face templates ---
+# Stored in voters.face_data as a fixed-layout BLOB: a 4-byte header (b"SVF"
+# plus a version byte) followed by FACE_KEYPOINTS (x, y) little-endian float32
+# pairs. Decoding is a zero-copy np.frombuffer view.
+FACE_TEMPLATE_MAGIC = b"SVF"
+FACE_TEMPLATE_VERSION = 1
+FACE_KEYPOINTS = 6
+FACE_TEMPLATE_HEADER = FACE_TEMPLATE_MAGIC + bytes([FACE_TEMPLATE_VERSION])
+FACE_TEMPLATE_SIZE = len(FACE_TEMPLATE_HEADER) + FACE_KEYPOINTS * 2 * 4
+FACE_TEMPLATE_DTYPE = np.dtype("<f4")
+
+def encode_face_template(landmarks):
+    """Packs an (N, 2) landmark array into a face template BLOB."""
+    points = np.asarray(landmarks, dtype=FACE_TEMPLATE_DTYPE)
+    if points.shape != (FACE_KEYPOINTS, 2):
+        raise ValueError(f"expected {FACE_KEYPOINTS} keypoints, got shape {points.shape}")
+    return FACE_TEMPLATE_HEADER + points.tobytes()
+
+def decode_face_template(blob):
+    """Returns a read-only (FACE_KEYPOINTS, 2) float32 view over a template BLOB."""
+    if len(blob) != FACE_TEMPLATE_SIZE or bytes(blob[:len(FACE_TEMPLATE_HEADER)]) != FACE_TEMPLATE_HEADER:
+        raise ValueError("not a v1 face template")
+    return np.frombuffer(blob, dtype=FACE_TEMPLATE_DTYPE,
+                         offset=len(FACE_TEMPLATE_HEADER)).reshape(FACE_KEYPOINTS, 2)
+
+def _legacy_face_template(face_data_b64):
+    """Converts a pre-v4 base64 pickled landmark array to a template BLOB."""
+    return encode_face_template(pickle.loads(base64.b64decode(face_data_b64)))
+
 def init_db():
-    """Initializes the SQLite database tables and migrations if they don't exist."""
-    created = not DB_PATH.exists()
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
+    """Creates or migrates the schema on every shard; True if any file was new."""
+    check_shard_layout()
+    created = False
+    for shard in range(DB_SHARDS):
+        created = not shard_path(shard).exists() or created
+        migrate_shard(shard)
+    return created
+
+# --- Schema migrations, keyed on PRAGMA user_version ---
+MIGRATION_CHUNK = int(os.environ.get("SVM_MIGRATION_CHUNK", 5000))
+
+def _columns(conn, table):
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _m1_base_schema(conn):
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS voters (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             voter_id TEXT UNIQUE,
@@ -50,7 +487,7 @@ def init_db():
             created_at TEXT
         )
     """)
-    c.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS votes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             voter_id TEXT,
@@ -58,17 +495,512 @@ def init_db():
             timestamp TEXT
         )
     """)
-    
-    # Check for the new 'face_data' column and add it if it's missing.
-    c.execute("PRAGMA table_info(voters)")
-    columns = [row['name'] for row in c.fetchall()]
-    if 'face_data' not in columns:
-        c.execute("ALTER TABLE voters ADD COLUMN face_data TEXT")
-    
-    conn.commit()
-    conn.close()
-    return created
-init_db()
+    # Databases from before the face step lack the 'face_data' column.
+    if 'face_data' not in _columns(conn, "voters"):
+        conn.execute("ALTER TABLE voters ADD COLUMN face_data TEXT")
+    # Running per-candidate totals, kept in step with `votes` by record_vote().
+    tallies_missing = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tallies'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tallies (
+            candidate TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    if tallies_missing:
+        conn.execute("INSERT INTO tallies (candidate, count) SELECT candidate, COUNT(*) FROM votes GROUP BY candidate")
+
+def _m2_hot_path_indexes(conn):
+    # voters(created_at, id) also serves plain created_at lookups and ordering.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_voters_created_at ON voters(created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_votes_voter_id ON votes(voter_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_votes_timestamp ON votes(timestamp)")
+
+def _m3_epoch_columns(conn):
+    if "created_epoch" not in _columns(conn, "voters"):
+        conn.execute("ALTER TABLE voters ADD COLUMN created_epoch INTEGER")
+    if "ts_epoch" not in _columns(conn, "votes"):
+        conn.execute("ALTER TABLE votes ADD COLUMN ts_epoch INTEGER")
+
+def _m3_backfill_epochs(conn):
+    _backfill(conn, "voters", "created_epoch = CAST(strftime('%s', created_at) AS INTEGER)",
+              "created_epoch IS NULL AND created_at IS NOT NULL")
+    _backfill(conn, "votes", "ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)",
+              "ts_epoch IS NULL AND timestamp IS NOT NULL")
+
+def _backfill(conn, table, assignment, pending):
+    """Runs an UPDATE over `table` in rowid ranges, committing after every chunk."""
+    high_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    last_id = 0
+    while last_id < high_id:
+        upper = last_id + MIGRATION_CHUNK
+        conn.execute(f"UPDATE {table} SET {assignment} WHERE id > ? AND id <= ? AND {pending}",
+                     (last_id, upper))
+        conn.commit()
+        last_id = upper
+
+def _m4_convert_face_templates(conn):
+    """Rewrites base64 pickled face_data TEXT values as template BLOBs, chunk by chunk."""
+    high_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM voters").fetchone()[0]
+    last_id = 0
+    failed = 0
+    while last_id < high_id:
+        upper = last_id + MIGRATION_CHUNK
+        rows = conn.execute("SELECT id, face_data FROM voters WHERE id > ? AND id <= ? "
+                            "AND typeof(face_data) = 'text'", (last_id, upper)).fetchall()
+        updates = []
+        for row in rows:
+            try:
+                template = _legacy_face_template(row["face_data"]) if row["face_data"] else None
+            except Exception:
+                template = None
+                failed += 1
+            updates.append((template, row["id"]))
+        conn.executemany("UPDATE voters SET face_data=? WHERE id=?", updates)
+        conn.commit()
+        last_id = upper
+    if failed:
+        logging.warning("%d voters had unreadable face data and must be re-enrolled.", failed)
+
+def _m5_meta(conn):
+    # Counters other processes poll to invalidate their caches (see VoterCache).
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('voters_generation', 0)")
+
+def _m6_shard_count(conn):
+    # The layout this file was written under; check_shard_layout() refuses to
+    # start when SVM_DB_SHARDS no longer matches it.
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('shard_count', ?)", (DB_SHARDS,))
+
+def _m7_database_id(conn):
+    # Random per-file id; side files such as the face index record it and
+    # are rebuilt when it no longer matches (database replaced or restored).
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', ?)",
+                 (int.from_bytes(os.urandom(7), "big"),))
+
+# (version, description, optional schema step run under the write lock, optional chunked backfill)
+MIGRATIONS = [
+    (1, "base voters/votes/tallies schema", _m1_base_schema, None),
+    (2, "indexes for hot paths", _m2_hot_path_indexes, None),
+    (3, "integer epoch timestamps", _m3_epoch_columns, _m3_backfill_epochs),
+    (4, "binary float32 face templates", None, _m4_convert_face_templates),
+    (5, "meta counters for cache invalidation", _m5_meta, None),
+    (6, "record the shard count", _m6_shard_count, None),
+    (7, "database identity", _m7_database_id, None),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_shard(shard):
+    """
+    Brings one shard up to SCHEMA_VERSION. A no-op costing one PRAGMA when
+    already current, so every worker can call it at import. Schema steps run
+    under BEGIN IMMEDIATE and re-check the version, so concurrent workers
+    apply each step once; backfills commit in MIGRATION_CHUNK-row chunks so
+    voting is never locked out for long, and the version is only bumped
+    once the backfill has finished.
+    """
+    conn = get_conn(shard=shard)
+    try:
+        if _user_version(conn) >= SCHEMA_VERSION:
+            return
+        for version, description, schema, backfill in MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            if _user_version(conn) >= version:
+                conn.commit()
+                continue
+            logging.info("Migrating %s to v%d: %s", shard_path(shard).name, version, description)
+            if schema is not None:
+                schema(conn)
+            if backfill is not None:
+                conn.commit()
+                backfill(conn)
+                conn.execute("BEGIN IMMEDIATE")
+            conn.execute(f"PRAGMA user_version = {max(version, _user_version(conn))}")
+            conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _stored_shard_count(path):
+    """shard_count recorded in a database file, or None if it predates v6."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'shard_count'").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # no meta table yet
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+def check_shard_layout():
+    """
+    Refuses to run when database files on disk were written under a
+    different SVM_DB_SHARDS: their voters would silently be looked up on
+    the wrong shard. `flask --app app reshard` moves the rows over.
+    """
+    layout = {shard_path(shard) for shard in range(DB_SHARDS)}
+    paths = {DB_PATH} | set(DB_PATH.parent.glob(f"{DB_PATH.stem}.shard*{DB_PATH.suffix}"))
+    for path in sorted(p for p in paths if p.exists()):
+        stored = _stored_shard_count(path)
+        if stored is None and path == DB_PATH:
+            stored = 1  # files from before v6 only used DB_PATH itself when unsharded
+        if stored == DB_SHARDS or (stored is None and path in layout):
+            continue
+        hint = f"--from-shards {stored}" if stored else "--from-shards <old SVM_DB_SHARDS>"
+        raise RuntimeError(
+            f"{path.name} belongs to a {stored or 'different'}-shard layout but SVM_DB_SHARDS={DB_SHARDS}. "
+            f"Restore the old setting, or stop the app and run "
+            f"`SVM_AUTO_MIGRATE=0 flask --app app reshard {hint}`.")
+
+# Workers migrate at import unless the deployment runs `flask --app app migrate`
+# once up front and sets SVM_AUTO_MIGRATE=0.
+if os.environ.get("SVM_AUTO_MIGRATE", "1") == "1":
+    init_db()
+
+# --- Voter record cache ---
+def bump_voters_generation(conn):
+    """Marks voter rows as changed for every worker's cache; call inside the admin write's transaction."""
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'voters_generation'")
+
+class VoterCache:
+    """
+    Per-worker LRU read-through cache of voter rows with decoded face templates.
+
+    Staleness is detected per shard with a dedicated watch connection: its
+    PRAGMA data_version only moves when some other connection commits, and
+    only then is meta.voters_generation (bumped by admin edits, deletes and
+    resets) re-read. A changed generation drops that shard's entries. Casting
+    does not bump the generation, so has_voted may be stale in other workers;
+    record_vote()'s conditional UPDATE stays the authority on double votes.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._pid = None
+        self.hits = self.misses = self.invalidations = 0
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._entries = [OrderedDict() for _ in range(DB_SHARDS)]
+        self._watch = [None] * DB_SHARDS
+        self._seen = [(None, None)] * DB_SHARDS
+
+    def _check(self, shard):
+        if self._pid != os.getpid():
+            self._reset()
+        if self._watch[shard] is None:
+            self._watch[shard] = _connect(shard)
+        watch = self._watch[shard]
+        data_version = watch.execute("PRAGMA data_version").fetchone()[0]
+        seen_version, seen_generation = self._seen[shard]
+        if data_version == seen_version:
+            return
+        generation = watch.execute("SELECT value FROM meta WHERE key = 'voters_generation'").fetchone()[0]
+        if seen_generation is not None and generation != seen_generation:
+            if self._entries[shard]:
+                self.invalidations += 1
+            self._entries[shard].clear()
+        self._seen[shard] = (data_version, generation)
+
+    def get(self, voter_id):
+        """Returns the voter's cached record dict, or None if not registered."""
+        shard = shard_for(voter_id)
+        if self.size > 0:
+            with self._lock:
+                self._check(shard)
+                entry = self._entries[shard].get(voter_id)
+                if entry is not None:
+                    self._entries[shard].move_to_end(voter_id)
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                generation = self._seen[shard][1]
+        entry = self._load(voter_id)
+        if entry is not None and self.size > 0:
+            with self._lock:
+                # An admin write that committed while _load ran may not be in
+                # the row it read; only cache it if the generation held still.
+                self._check(shard)
+                if self._seen[shard][1] != generation:
+                    return entry
+                entries = self._entries[shard]
+                entries[voter_id] = entry
+                while len(entries) > self.size:
+                    entries.popitem(last=False)
+        return entry
+
+    def _load(self, voter_id):
+        conn = get_conn(voter_id)
+        try:
+            with stage("db_query"):
+                r = conn.execute("SELECT voter_id, name, dob, phone, fingerprint, has_voted, face_data "
+                                 "FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
+        finally:
+            conn.close()
+        if r is None:
+            return None
+        entry = {k: r[k] for k in ("voter_id", "name", "dob", "phone", "fingerprint")}
+        entry["has_voted"] = bool(r["has_voted"])
+        try:
+            entry["face"] = decode_face_template(r["face_data"]) if r["face_data"] else None
+        except ValueError:
+            entry["face"] = None
+        return entry
+
+    def mark_voted(self, voter_id):
+        """Records a cast made by this worker in its cached copy."""
+        if self.size <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                entry = self._entries[shard_for(voter_id)].get(voter_id)
+                if entry is not None:
+                    entry["has_voted"] = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": sum(len(e) for e in self._entries) if self._pid == os.getpid() else 0}
+
+voter_cache = VoterCache(VOTER_CACHE_SIZE)
+
+# --- Face index (1:N duplicate enrollment search) ---
+def database_id():
+    """The database_id stamped into shard 0, or 0 before migration v7."""
+    conn = get_conn(shard=0)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+class FaceIndex:
+    """
+    Memory-mapped matrix of every enrolled face template, shared read-only by
+    all workers of a deployment.
+
+    File layout: a 64-byte header of little-endian uint64s (magic, version,
+    capacity, count, database_id of the database it was built from), then `capacity` int64 keys (shard << 48 | voters.id,
+    -1 for a deleted slot), then `capacity` rows of float32 template values.
+    Writers serialize on an flock'd side file and publish an append by
+    bumping `count` last; growing past capacity rewrites the file and
+    atomically renames it over the old one, which readers notice by inode.
+    An index whose database_id no longer matches is rebuilt from the voters.
+    """
+    MAGIC = 0x5844494D56535653  # b"SVSVMIDX" little-endian
+    VERSION = 2
+    HEADER_WORDS = 8
+    DIMS = FACE_KEYPOINTS * 2
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock_path = Path(f"{path}.lock")
+        self._map_lock = threading.Lock()
+        self._mapped = None  # (pid, inode, header, keys, templates)
+
+    @staticmethod
+    def key(shard, rowid):
+        return (shard << 48) | rowid
+
+    @staticmethod
+    def split_key(key):
+        return int(key) >> 48, int(key) & ((1 << 48) - 1)
+
+    def _views(self, mm):
+        header = np.ndarray((self.HEADER_WORDS,), dtype="<u8", buffer=mm)
+        capacity = int(header[2])
+        keys = np.ndarray((capacity,), dtype="<i8", buffer=mm, offset=self.HEADER_WORDS * 8)
+        templates = np.ndarray((capacity, self.DIMS), dtype="<f4", buffer=mm,
+                               offset=self.HEADER_WORDS * 8 + capacity * 8)
+        return header, keys, templates
+
+    def _create(self, path, capacity):
+        size = self.HEADER_WORDS * 8 + capacity * (8 + self.DIMS * 4)
+        mm = np.memmap(path, dtype=np.uint8, mode="w+", shape=(size,))
+        header = np.ndarray((self.HEADER_WORDS,), dtype="<u8", buffer=mm)
+        header[:5] = (self.MAGIC, self.VERSION, capacity, 0, database_id())
+        return mm
+
+    def _open(self, mode):
+        mm = np.memmap(self.path, dtype=np.uint8, mode=mode)
+        if int(np.ndarray((1,), dtype="<u8", buffer=mm)[0]) != self.MAGIC:
+            raise ValueError(f"{self.path} is not a face index")
+        return mm
+
+    def _current(self, mm):
+        header = np.ndarray((self.HEADER_WORDS,), dtype="<u8", buffer=mm)
+        return int(header[1]) == self.VERSION and int(header[4]) == database_id()
+
+    def _locked(self):
+        lock = open(self.lock_path, "a+")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def build(self, entries, capacity_hint=1024):
+        """Writes a fresh, compacted index from (key, template array) pairs and swaps it in."""
+        with self._locked():
+            self._build_locked(entries, capacity_hint)
+
+    def _build_locked(self, entries, capacity_hint):
+        tmp = Path(f"{self.path}.tmp")
+        capacity = max(capacity_hint, 1024)
+        mm = self._create(tmp, capacity)
+        header, keys, templates = self._views(mm)
+        count = 0
+        for key, template in entries:
+            if count == capacity:
+                header[3] = count
+                mm.flush()
+                mm = self._grow(tmp, mm, capacity * 2)
+                header, keys, templates = self._views(mm)
+                capacity = int(header[2])
+            keys[count] = key
+            templates[count] = np.asarray(template, dtype="<f4").reshape(-1)
+            count += 1
+        header[3] = count
+        mm.flush()
+        del header, keys, templates, mm
+        os.replace(tmp, self.path)
+
+    def _grow(self, path, mm, capacity):
+        """Copies the live prefix of an open index into a larger file at `path`."""
+        header, keys, templates = self._views(mm)
+        count = int(header[3])
+        grown_path = Path(f"{path}.grow")
+        grown = self._create(grown_path, capacity)
+        g_header, g_keys, g_templates = self._views(grown)
+        g_keys[:count] = keys[:count]
+        g_templates[:count] = templates[:count]
+        g_header[3] = count
+        grown.flush()
+        del header, keys, templates, mm, g_header, g_keys, g_templates
+        os.replace(grown_path, path)
+        return grown
+
+    def add_many(self, entries):
+        """Appends (key, template) pairs, skipping keys already live in the index."""
+        entries = list(entries)
+        if not entries:
+            return
+        with self._locked():
+            # Rebuilding from the voters table picks up the new (committed) rows too.
+            if not self.path.exists() or not self._current(self._open("r")):
+                self._build_locked(_iter_enrolled_faces(), 1024)
+                return
+            mm = self._open("r+")
+            header, keys, templates = self._views(mm)
+            count, capacity = int(header[3]), int(header[2])
+            present = set(keys[:count][np.isin(keys[:count], [k for k, _ in entries])].tolist())
+            entries = [(k, t) for k, t in entries if k not in present]
+            if count + len(entries) > capacity:
+                mm.flush()
+                del header, keys, templates
+                mm = self._grow(self.path, mm, max(capacity * 2, count + len(entries)))
+                header, keys, templates = self._views(mm)
+            for i, (key, template) in enumerate(entries):
+                keys[count + i] = key
+                templates[count + i] = np.asarray(template, dtype="<f4").reshape(-1)
+            header[3] = count + len(entries)  # publish last
+            mm.flush()
+
+    def remove(self, key):
+        """Tombstones every slot holding `key`."""
+        with self._locked():
+            if not self.path.exists():
+                return
+            mm = self._open("r+")
+            if not self._current(mm):
+                del mm
+                self._build_locked(_iter_enrolled_faces(), 1024)
+                return
+            header, keys, _ = self._views(mm)
+            count = int(header[3])
+            keys[:count][keys[:count] == key] = -1
+            mm.flush()
+
+    def _reader(self):
+        with self._map_lock:
+            if not self.path.exists():
+                with self._locked():
+                    if not self.path.exists():
+                        self._build_locked(_iter_enrolled_faces(), 1024)
+            inode = os.stat(self.path).st_ino
+            if self._mapped is None or self._mapped[0] != os.getpid() or self._mapped[1] != inode:
+                mm = self._open("r")
+                if not self._current(mm):
+                    with self._locked():
+                        if not self._current(self._open("r")):
+                            logging.warning("%s was built from another database; rebuilding it.", self.path.name)
+                            self._build_locked(_iter_enrolled_faces(), 1024)
+                    inode = os.stat(self.path).st_ino
+                    mm = self._open("r")
+                header, keys, templates = self._views(mm)
+                self._mapped = (os.getpid(), inode, header, keys, templates)
+            return self._mapped[2:]
+
+    def nearest(self, template, k=DUPLICATE_FACE_LIMIT):
+        """Returns up to k (key, distance) pairs, closest first, in one vectorized pass."""
+        header, keys, templates = self._reader()
+        count = int(header[3])
+        if count == 0:
+            return []
+        live_keys = keys[:count]
+        query = np.asarray(template, dtype="<f4").reshape(1, -1)
+        diff = templates[:count] - query
+        distances = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        distances[live_keys < 0] = np.inf
+        k = min(k, count)
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        return [(int(live_keys[i]), float(distances[i])) for i in best if np.isfinite(distances[i])]
+
+def _iter_enrolled_faces(chunk_size=5000):
+    """Yields (index key, template) for every voter with a face, shard by shard."""
+    for shard in range(DB_SHARDS):
+        last_id = 0
+        while True:
+            conn = get_conn(shard=shard)
+            try:
+                rows = conn.execute("SELECT id, face_data FROM voters WHERE id > ? AND face_data IS NOT NULL "
+                                    "ORDER BY id LIMIT ?", (last_id, chunk_size)).fetchall()
+            finally:
+                conn.close()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            for r in rows:
+                try:
+                    yield FaceIndex.key(shard, r["id"]), decode_face_template(r["face_data"])
+                except ValueError:
+                    continue
+
+face_index = FaceIndex(DB_PATH.with_name(f"{DB_PATH.stem}.faces"))
+
+def find_duplicate_faces(template, threshold=FACE_MATCH_THRESHOLD, limit=DUPLICATE_FACE_LIMIT):
+    """Enrolled voters whose face would pass compare_faces against `template`."""
+    matches = [(key, d) for key, d in face_index.nearest(template, limit) if d < threshold]
+    by_shard = {}
+    for key, distance in matches:
+        shard, rowid = FaceIndex.split_key(key)
+        by_shard.setdefault(shard, {})[rowid] = distance
+    found = []
+    for shard, rows in by_shard.items():
+        conn = get_conn(shard=shard)
+        try:
+            placeholders = ",".join("?" * len(rows))
+            for r in conn.execute(f"SELECT id, voter_id, name FROM voters WHERE id IN ({placeholders})", list(rows)):
+                found.append({"voter_id": r["voter_id"], "name": r["name"], "distance": round(rows[r["id"]], 4)})
+        finally:
+            conn.close()
+    return sorted(found, key=lambda m: m["distance"])
 
 # Utility functions
 def calculate_age(dob_str):
@@ -87,41 +1019,360 @@ def send_sms(to_number, message):
     In a real-world scenario, this would use a service like Twilio or Vonage.
     For this demo, we'll log the message to the console.
     """
-    logging.info(f"Simulating SMS to {to_number}: {message}")
+    logging.info("Simulating SMS to %s: %s", to_number, message)
 
 # --- MediaPipe/Face Recognition Functions ---
-mp_face_detection = mp.solutions.face_detection
-mp_drawing = mp.solutions.drawing_utils
-face_detection = mp_face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
+_vision = None
+_vision_lock = threading.Lock()
+_face_detection = None
+_face_detection_lock = threading.Lock()
+
+def vision():
+    """
+    Imports the vision stack (cv2, MediaPipe) on first use. Importing it costs
+    most of a second, which admin workers and CLI tooling never need to pay.
+    """
+    global _vision
+    if _vision is None:
+        with _vision_lock:
+            if _vision is None:
+                import cv2
+                import mediapipe
+                _vision = (cv2, mediapipe)
+    return _vision
+
+def get_face_detection():
+    """Builds this process's MediaPipe detector on first use."""
+    global _face_detection
+    if _face_detection is None:
+        _, mp = vision()
+        with _face_detection_lock:
+            if _face_detection is None:
+                _face_detection = mp.solutions.face_detection.FaceDetection(
+                    model_selection=FACE_DETECTOR_MODEL, min_detection_confidence=0.5)
+    return _face_detection
+
+_warm_up_done = threading.Event()
+_warm_up_started = threading.Lock()
+_warm_up_stats = {}
+
+def warm_up():
+    """
+    Loads the detector and pushes one dummy frame through the whole decode and
+    inference path (or the inference service, when one is configured), so the
+    first voter does not pay for graph initialization.
+    """
+    start = time.perf_counter()
+    try:
+        if INFERENCE_SOCKET:
+            while True:  # the service may still be starting alongside the web workers
+                try:
+                    _inference_client.detect(bytes.fromhex("ffd8ffd9"))  # empty JPEG: "no face"
+                    break
+                except OSError:
+                    time.sleep(1)
+        else:
+            cv2, _ = vision()
+            frame = cv2.imencode(".jpg", np.zeros((240, 320, 3), np.uint8))[1].tobytes()
+            detect_face_template(frame)
+    except Exception as e:
+        logging.exception("Warm-up of worker %d failed; the next /readyz probe retries it", os.getpid())
+        _warm_up_stats["error"] = str(e)
+        _warm_up_started.release()
+        return
+    _warm_up_stats.pop("error", None)
+    _warm_up_stats["seconds"] = round(time.perf_counter() - start, 3)
+    logging.info("Worker %d warmed up in %ss (%s profile)", os.getpid(), _warm_up_stats["seconds"], PROFILE)
+    _warm_up_done.set()
+
+def start_warm_up():
+    """
+    Runs warm_up() on a background thread unless it is running or has
+    succeeded in this process (booth profile only); a failed warm-up can be
+    started again.
+    """
+    if PROFILE != "booth" or not _warm_up_started.acquire(blocking=False):
+        return
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 def get_face_data(image_data_b64):
-    """Detects a face in a base64 image and returns the serialized landmark data."""
+    """Detects a face in a base64 image and returns its face template."""
     try:
-        img_bytes = base64.b64decode(image_data_b64)
-        np_arr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        with stage("b64_decode"):
+            img_bytes = base64.b64decode(image_data_b64)
+    except Exception as e:
+        logging.error("Error decoding base64 image: %s", e)
+        return None
+    return face_data_from_bytes(img_bytes)
 
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_detection.process(image_rgb)
-        
-        if results.detections:
-            landmarks = results.detections[0].location_data.relative_keypoints
-            landmark_array = np.array([(p.x, p.y) for p in landmarks])
-            return pickle.dumps(landmark_array) # Serialize for storage
+def face_data_from_bytes(img_bytes):
+    """Detects a face in encoded image bytes (JPEG/PNG) and returns its face template."""
+    if INFERENCE_SOCKET:
+        try:
+            return _inference_client.detect(img_bytes)
+        except OSError as e:
+            logging.error("Inference service unavailable: %s", e)
+            return None
+    return detect_face_template(img_bytes)
+
+_DECODE_FLAGS = {1: "IMREAD_COLOR", 2: "IMREAD_REDUCED_COLOR_2",
+                 4: "IMREAD_REDUCED_COLOR_4", 8: "IMREAD_REDUCED_COLOR_8"}
+if FACE_DECODE_REDUCTION not in _DECODE_FLAGS:
+    raise ValueError(f"SVM_FACE_DECODE_REDUCTION must be one of {sorted(_DECODE_FLAGS)}, "
+                     f"not {FACE_DECODE_REDUCTION}")
+
+def prepare_frame(img_bytes):
+    """
+    Decodes an encoded frame into the RGB array MediaPipe expects, honouring
+    FACE_DECODE_REDUCTION and FACE_TARGET_SHORT_SIDE. Keypoints are relative
+    to the frame, so templates do not depend on the working resolution.
+    """
+    cv2, _ = vision()
+    with stage("imdecode"):
+        frame = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), getattr(cv2, _DECODE_FLAGS[FACE_DECODE_REDUCTION]))
+    if frame is None:
+        raise ValueError("could not decode image")
+    short_side = min(frame.shape[:2])
+    if FACE_TARGET_SHORT_SIDE and short_side > FACE_TARGET_SHORT_SIDE:
+        scale = FACE_TARGET_SHORT_SIDE / short_side
+        frame = cv2.resize(frame, (round(frame.shape[1] * scale), round(frame.shape[0] * scale)),
+                           interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+def face_data_from_frames(frames):
+    """
+    Yields the face template (or None) of each frame in order. Through the
+    inference service the whole burst goes out as one batch; in-process
+    frames are detected lazily, so a caller that stops early skips the rest.
+    """
+    if INFERENCE_SOCKET:
+        try:
+            yield from _inference_client.detect_many(frames)
+            return
+        except OSError as e:
+            logging.error("Inference service unavailable: %s", e)
+            yield from (None for _ in frames)
+            return
+    for frame in frames:
+        yield detect_face_template(frame)
+
+def detect_face_template(img_bytes):
+    """Runs MediaPipe in this process and returns the face template, or None."""
+    return detect_face(img_bytes)[0]
+
+def detect_face(img_bytes, roi=None):
+    """
+    Runs MediaPipe in this process; the graph is not thread-safe, so calls are
+    serialized. Returns (template, box), box being the face's relative
+    (xmin, ymin, width, height). Given the previous frame's box as `roi`, only
+    that region (plus FACE_ROI_MARGIN on each side) is searched, falling back
+    to the whole frame; keypoints are mapped back to full-frame coordinates.
+    """
+    try:
+        image_rgb = prepare_frame(img_bytes)
+        height, width = image_rgb.shape[:2]
+        detector = get_face_detection()
+        regions = [(0, 0, width, height)]
+        if roi is not None:
+            xmin, ymin, w, h = roi
+            regions.insert(0, (max(int((xmin - w * FACE_ROI_MARGIN) * width), 0),
+                               max(int((ymin - h * FACE_ROI_MARGIN) * height), 0),
+                               min(int((xmin + w * (1 + FACE_ROI_MARGIN)) * width), width),
+                               min(int((ymin + h * (1 + FACE_ROI_MARGIN)) * height), height)))
+        for x0, y0, x1, y1 in regions:
+            if x1 - x0 < 16 or y1 - y0 < 16:
+                continue
+            crop = np.ascontiguousarray(image_rgb[y0:y1, x0:x1])
+            with _face_detection_lock, stage("face_detect"):
+                results = detector.process(crop)
+            if results.detections:
+                cw, ch = x1 - x0, y1 - y0
+                location = results.detections[0].location_data
+                landmarks = [((x0 + p.x * cw) / width, (y0 + p.y * ch) / height)
+                             for p in location.relative_keypoints]
+                b = location.relative_bounding_box
+                box = ((x0 + b.xmin * cw) / width, (y0 + b.ymin * ch) / height,
+                       b.width * cw / width, b.height * ch / height)
+                return encode_face_template(landmarks), box
     except Exception as e:
-        logging.error(f"Error processing image with MediaPipe: {e}")
-    return None
+        logging.error("Error processing image with MediaPipe: %s", e)
+    return None, None
+
+# --- Shared local inference service ---
+# Wire format: a request is a 4-byte big-endian frame count followed by that
+# many frames; the response carries the same number of frames. Each frame is
+# a 4-byte big-endian length and the payload: encoded image bytes going in,
+# a face template (or nothing when no face was found) coming back.
 
-def compare_faces(known_face_data_b64, live_face_data_b64):
-    """Compares two pickled face data arrays and returns true if they are a match."""
+def _send_frame(sock, payload):
+    sock.sendall(len(payload).to_bytes(4, "big"))
+    sock.sendall(payload)
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view, size)
+        if not n:
+            raise ConnectionError("inference connection closed")
+        view, size = view[n:], size - n
+    return bytes(buf)
+
+def _recv_frame(sock):
+    return _recv_exact(sock, int.from_bytes(_recv_exact(sock, 4), "big"))
+
+class InferenceClient:
+    """Per-thread persistent Unix socket connection to the inference service."""
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None or getattr(self._local, "pid", None) != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock, self._local.pid = sock, os.getpid()
+        return sock
+
+    def detect(self, img_bytes):
+        """Returns the face template for an encoded frame, or None; raises OSError if unreachable."""
+        return self.detect_many([img_bytes])[0]
+
+    def detect_many(self, frames):
+        """Detects a burst of frames in one round trip; a list of templates or None."""
+        for attempt in (1, 2):  # one reconnect if the service restarted
+            sock = self._socket()
+            try:
+                with stage("inference_rpc"):
+                    sock.sendall(len(frames).to_bytes(4, "big"))
+                    for frame in frames:
+                        _send_frame(sock, frame)
+                    return [_recv_frame(sock) or None for _ in frames]
+            except OSError:
+                sock.close()
+                self._local.sock = None
+                if attempt == 2:
+                    raise
+
+_inference_client = InferenceClient(INFERENCE_SOCKET, INFERENCE_TIMEOUT) if INFERENCE_SOCKET else None
+
+def _inference_batch(frames):
+    """Inference-process task: templates for a batch of frames (b"" for no face)."""
+    return [detect_face_template(frame) or b"" for frame in frames]
+
+class InferenceDispatcher:
+    """
+    Collects frames from concurrent connections into batches (up to max_batch,
+    or whatever arrived within max_wait_ms) and spreads each batch across a
+    pool of inference processes, each holding one MediaPipe detector. If an
+    inference process dies, the frames it held fail, and the pool is replaced
+    before the next batch.
+    """
+    def __init__(self, workers, max_batch, max_wait_ms):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._pool = self._new_pool()
+        threading.Thread(target=self._run, name="inference-dispatch", daemon=True).start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=get_face_detection)
+
+    def submit(self, frame):
+        future = Future()
+        self._queue.put((frame, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            per_worker = -(-len(batch) // self.workers)
+            for i in range(0, len(batch), per_worker):
+                part = batch[i:i + per_worker]
+                try:
+                    task = self._pool.submit(_inference_batch, [frame for frame, _ in part])
+                except BrokenProcessPool as e:
+                    logging.error("Inference pool broken, restarting it: %s", e)
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._new_pool()
+                    for _, future in batch[i:]:
+                        future.set_exception(e)
+                    break
+                except Exception as e:
+                    logging.exception("Inference dispatch failed")
+                    for _, future in batch[i:]:
+                        future.set_exception(e)
+                    break
+                task.add_done_callback(lambda t, part=part: self._resolve(t, part))
+
+    @staticmethod
+    def _resolve(task, part):
+        try:
+            results = task.result()
+        except Exception as e:
+            logging.error("Inference batch failed: %s", e)
+            for _, future in part:
+                future.set_exception(e)
+            return
+        for (_, future), template in zip(part, results):
+            future.set_result(template)
+
+class _InferenceHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                count = int.from_bytes(_recv_exact(self.request, 4), "big")
+                futures = [self.server.dispatcher.submit(_recv_frame(self.request)) for _ in range(count)]
+                for future in futures:
+                    _send_frame(self.request, future.result(timeout=INFERENCE_TIMEOUT))
+            except (FutureTimeout, TimeoutError):
+                # Only aliases of each other from Python 3.11 on. Dropping the
+                # connection makes the web worker's detect_many() raise.
+                logging.error("Inference request timed out after %ss", INFERENCE_TIMEOUT)
+                return
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                logging.error("Inference request failed: %s", e)
+                return
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, dispatcher):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.dispatcher = dispatcher
+        super().__init__(path, _InferenceHandler)
+
+def face_distance(known_face_data, live_face_data):
+    """Euclidean distance between two face templates (BLOBs or decoded arrays)."""
+    with stage("template_compare"):
+        known_landmarks = decode_face_template(known_face_data) if isinstance(known_face_data, bytes) else known_face_data
+        live_landmarks = decode_face_template(live_face_data) if isinstance(live_face_data, bytes) else live_face_data
+        return float(np.linalg.norm(live_landmarks - known_landmarks))
+
+def compare_faces(known_face_data, live_face_data):
+    """Compares two face templates (BLOBs or decoded arrays) and returns true if they are a match."""
     try:
-        known_landmarks = pickle.loads(known_face_data_b64)
-        live_landmarks = pickle.loads(live_face_data_b64)
-        distance = np.linalg.norm(live_landmarks - known_landmarks)
-        logging.info(f"Face comparison distance: {distance}")
-        return distance < 0.4  # Increased tolerance for a match
+        distance = face_distance(known_face_data, live_face_data)
+        log_success("face_distance", "Face comparison distance: %s", distance)
+        return distance < FACE_MATCH_THRESHOLD  # Increased tolerance for a match
     except Exception as e:
-        logging.error(f"Error comparing faces: {e}")
+        logging.error("Error comparing faces: %s", e)
     return False
 
 # --------------------
@@ -233,28 +1484,30 @@ navigator.mediaDevices.getUserMedia({ video: true })
     });
 
 // Capture and encode the face on button click
-captureBtn.addEventListener('click', () => {
+captureBtn.addEventListener('click', async () => {
     let canvas = document.createElement('canvas');
     canvas.width = video.videoWidth;
     canvas.height = video.videoHeight;
     canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
     
-    const imageDataURL = canvas.toDataURL('image/jpeg');
-    const base64Data = imageDataURL.replace(/^data:image\/(png|jpeg);base64,/, '');
+    // Send the JPEG as a raw binary body rather than base64 JSON
+    const imageBlob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg'));
+    const imageDataURL = URL.createObjectURL(imageBlob);
     
-    // Simulate sending to the backend for processing
     fetch('/api/enroll_face', {
         method: 'POST',
         headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'image/jpeg'
         },
-        body: JSON.stringify({
-            image_data: base64Data
-        })
+        body: imageBlob
     }).then(response => response.json())
       .then(data => {
           if (data.ok) {
               faceDataInput.value = data.face_data;
+              if (data.duplicates && data.duplicates.length) {
+                  const names = data.duplicates.map(d => `${d.voter_id} (${d.name})`).join(', ');
+                  alert('Warning: this face matches already enrolled voter(s): ' + names);
+              }
               alert('Face captured and processed successfully!');
               
               // Draw the captured image to the preview canvas
@@ -318,7 +1571,6 @@ button{padding: 10px; background-color: #28a745; color: white; border: none; cur
     <input type="text" id="phone" name="phone" value="{{ voter.phone }}">
     <label for="fingerprint">Fingerprint template (text placeholder):</label>
     <input type="text" id="fingerprint" name="fingerprint" value="{{ voter.fingerprint }}">
-    <input type="hidden" name="face_data" value="{{ voter.face_data }}">
     <button type="submit">Update Voter</button>
 </form>
 </body>
@@ -346,7 +1598,7 @@ button.reset { background-color: #f39c12; margin-left: 5px; }
 </head>
 <body>
 <h2>Registered Voters</h2>
-<p><a href="/admin/add">Add voter</a> | <a href="/admin/logout">Logout</a></p>
+<p><a href="/admin/add">Add voter</a> | <a href="/admin/list">First page</a> | <a href="/admin/logout">Logout</a></p>
 {% with messages = get_flashed_messages(with_categories=true) %}
     {% if messages %}
         <ul class="flashes">
@@ -369,6 +1621,7 @@ button.reset { background-color: #f39c12; margin-left: 5px; }
     </tr>
 </thead>
 <tbody>
+    {% set page = namespace(count=0, last=None) %}
     {% for v in voters %}
     <tr>
         <td>{{ v.id }}</td>
@@ -387,9 +1640,13 @@ button.reset { background-color: #f39c12; margin-left: 5px; }
             </form>
         </td>
     </tr>
+    {% set page.count = page.count + 1 %}{% set page.last = v %}
     {% endfor %}
 </tbody>
 </table>
+{% if page.count == limit %}
+<p><a href="/admin/list?limit={{ limit }}&cursor_ts={{ page.last.created_at | urlencode }}&cursor_id={{ page.last.id }}&cursor_shard={{ page.last.shard }}">Next page</a></p>
+{% endif %}
 </body>
 </html>
 """
@@ -760,21 +2017,83 @@ INDEX_HTML = """
     }
 
     // Facial verification stage
-    document.getElementById('verify-face-btn').onclick = async () => {
+    const STREAM_FPS = {{ stream_fps }};
+    const STREAM_TIMEOUT_MS = {{ stream_timeout_ms }};
+    const STREAM_SHORT_SIDE = {{ stream_short_side }};
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+    // Streaming request bodies need fetch duplex support (Chromium, over HTTP/2)
+    const supportsRequestStreams = (() => {
+        let duplexAccessed = false;
+        const hasContentType = new Request('', {
+            body: new ReadableStream(), method: 'POST',
+            get duplex() { duplexAccessed = true; return 'half'; },
+        }).headers.has('Content-Type');
+        return duplexAccessed && !hasContentType;
+    })();
+
+    function captureFrame(canvas, mimeType = 'image/jpeg', quality = 0.8) {
+        canvas.getContext('2d').drawImage(faceVideo, 0, 0, canvas.width, canvas.height);
+        return new Promise(resolve => canvas.toBlob(resolve, mimeType, quality));
+    }
+
+    // Streams downscaled frames as [4-byte length][JPEG] until the server answers
+    async function verifyFaceStream() {
+        const scale = Math.min(1, STREAM_SHORT_SIDE / Math.min(faceVideo.videoWidth, faceVideo.videoHeight));
+        const canvas = document.createElement('canvas');
+        canvas.width = Math.round(faceVideo.videoWidth * scale);
+        canvas.height = Math.round(faceVideo.videoHeight * scale);
+        let streaming = true;
+        const stopAt = Date.now() + STREAM_TIMEOUT_MS;
+        let sent = 0;
+        const body = new ReadableStream({
+            async pull(controller) {
+                if (sent++ > 0) { await sleep(1000 / STREAM_FPS); }
+                if (!streaming || Date.now() > stopAt) { controller.close(); return; }
+                const bytes = new Uint8Array(await (await captureFrame(canvas)).arrayBuffer());
+                const prefix = new Uint8Array(4);
+                new DataView(prefix.buffer).setUint32(0, bytes.length);
+                controller.enqueue(prefix);
+                controller.enqueue(bytes);
+            }
+        });
+        try {
+            const res = await fetch('/api/verify_face/stream?voter_id=' + encodeURIComponent(currentVoter.voter_id), {
+                method: 'POST', headers: { 'Content-Type': 'application/octet-stream' }, body, duplex: 'half'
+            });
+            return await res.json();
+        } finally {
+            streaming = false;
+        }
+    }
+
+    // Capture a short burst so one blurry frame does not fail the whole flow
+    async function verifyFaceBurst() {
         const canvas = document.createElement('canvas');
         canvas.width = faceVideo.videoWidth;
         canvas.height = faceVideo.videoHeight;
-        canvas.getContext('2d').drawImage(faceVideo, 0, 0, canvas.width, canvas.height);
-        
-        const imageDataURL = canvas.toDataURL('image/jpeg');
-        const base64Data = imageDataURL.replace(/^data:image\/(png|jpeg);base64,/, '');
+        const form = new FormData();
+        form.append('voter_id', currentVoter.voter_id);
+        for (let i = 0; i < 3; i++) {
+            if (i > 0) { await sleep(150); }
+            form.append('image', await captureFrame(canvas, 'image/jpeg', 0.92), `frame${i}.jpg`);
+        }
+        const res = await fetch('/api/verify_face', { method: 'POST', body: form });
+        return await res.json();
+    }
 
-        const res = await fetch('/api/verify_face', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ voter_id: currentVoter.voter_id, image_data: base64Data })
-        });
-        const j = await res.json();
+    document.getElementById('verify-face-btn').onclick = async () => {
+        let j = null;
+        if (supportsRequestStreams) {
+            try {
+                j = await verifyFaceStream();
+            } catch (err) {
+                console.warn('Streaming verification unavailable, falling back to a burst: ', err);
+            }
+        }
+        if (j === null) {
+            j = await verifyFaceBurst();
+        }
         
         if (j.ok) {
             setStatus('face-status', 'Face OK! You are verified.', 'success');
@@ -812,9 +2131,230 @@ INDEX_HTML = """
 @APP.route("/")
 def index():
     """Renders the main voting machine UI."""
-    return render_template_string(INDEX_HTML)
+    return render_template_string(INDEX_HTML, stream_fps=FACE_STREAM_FPS,
+                                  stream_timeout_ms=int(FACE_STREAM_TIMEOUT * 1000),
+                                  stream_short_side=FACE_STREAM_SHORT_SIDE)
+
+# --- Admission control ---
+class AdmissionGate:
+    """
+    Bounded concurrency with a bounded wait queue: acquire() admits a caller
+    when a slot is free, waits up to max_wait_ms when the queue has room, and
+    otherwise returns False at once so the caller can shed the request.
+    The optional gauges track the queue depth and the callers admitted.
+    """
+    def __init__(self, concurrency, max_queue, max_wait_ms, queued_gauge=None, active_gauge=None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait_ms / 1000
+        self._queued_gauge = queued_gauge
+        self._active_gauge = active_gauge
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    def acquire(self):
+        with self._cond:
+            try:
+                if self.active < self.concurrency and not self.waiting:
+                    self.active += 1
+                    self.admitted += 1
+                    return True
+                if self.waiting >= self.max_queue:
+                    self.rejected_full += 1
+                    return False
+                self.waiting += 1
+                self._publish()
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while self.active >= self.concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            return False
+                        self._cond.wait(remaining)
+                    self.active += 1
+                    self.admitted += 1
+                    return True
+                finally:
+                    self.waiting -= 1
+            finally:
+                self._publish()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._publish()
+            self._cond.notify()
+
+    def _publish(self):
+        if self._queued_gauge is not None:
+            self._queued_gauge.set(self.waiting)
+        if self._active_gauge is not None:
+            self._active_gauge.set(self.active)
+
+    def stats(self):
+        with self._cond:
+            return {"concurrency": self.concurrency, "max_queue": self.max_queue, "active": self.active,
+                    "queued": self.waiting, "admitted": self.admitted,
+                    "rejected_full": self.rejected_full, "rejected_timeout": self.rejected_timeout}
+
+inference_gate = AdmissionGate(INFERENCE_CONCURRENCY, INFERENCE_QUEUE, INFERENCE_QUEUE_TIMEOUT_MS,
+                               INFERENCE_QUEUE_DEPTH, INFERENCE_IN_FLIGHT)
+
+def admit_inference():
+    """Takes an inference_gate slot; False (counted as shed) when the gate turns the caller away."""
+    if INFERENCE_CONCURRENCY <= 0:
+        return True
+    with stage("admission_wait"):
+        admitted = inference_gate.acquire()
+    if not admitted:
+        INFERENCE_SHED.inc()
+    return admitted
+
+def release_inference():
+    if INFERENCE_CONCURRENCY > 0:
+        inference_gate.release()
+
+def busy_response():
+    return jsonify(ok=False, error="busy", detail="Face service is busy, please retry."), 503, \
+        {"Retry-After": str(max(1, round(INFERENCE_QUEUE_TIMEOUT_MS / 1000)))}
+
+def inference_route(f):
+    """Decorator admitting a route through inference_gate, or shedding it with 503 and Retry-After."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not admit_inference():
+            logging.warning("Shedding %s: inference queue full in worker %d.", request.path, os.getpid())
+            return busy_response()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            release_inference()
+    return decorated_function
+
+def require_admin(f):
+    """Decorator to protect admin routes."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get("logged_in"):
+            return f(*args, **kwargs)
+        flash("Please log in to access this page.", "error")
+        return redirect(url_for("admin_login"))
+    return decorated_function
 
 # --- API endpoints used by frontend ---
+class TraceFileHandler(RotatingFileHandler):
+    """Rotating trace file; each file opens a JSON array, which trace viewers accept unterminated."""
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write("[\n")
+        return stream
+
+class TraceEventFormatter(logging.Formatter):
+    """Serializes a record's trace `events` as comma-terminated JSON array items."""
+    def format(self, record):
+        return ",\n".join(json.dumps(e) for e in record.events) + ","
+
+_trace_logger = None
+_trace_logger_lock = threading.Lock()
+
+def write_trace(events):
+    """
+    Queues one request's trace events for this worker's trace file. Only the
+    enqueue happens inline; JSON serialization, writes and rollover run on
+    the NonBlockingQueueHandler's listener thread.
+    """
+    global _trace_logger
+    with _trace_logger_lock:
+        if _trace_logger is None or _trace_logger.pid != os.getpid():
+            TRACE_DIR.mkdir(parents=True, exist_ok=True)
+            handler = TraceFileHandler(TRACE_DIR / f"trace.{os.getpid()}.json", maxBytes=TRACE_FILE_BYTES,
+                                       backupCount=TRACE_BACKUPS, delay=True)
+            handler.setFormatter(TraceEventFormatter())
+            _trace_logger = logging.getLogger(f"svm.trace.{os.getpid()}")
+            _trace_logger.propagate = False
+            _trace_logger.addHandler(NonBlockingQueueHandler(LOG_QUEUE_SIZE, handler))
+            _trace_logger.pid = os.getpid()
+    _trace_logger.info("trace", extra={"events": events})
+
+def traced(f):
+    """
+    Decorator tracing a route: stage() spans are collected while it runs, the
+    response carries them in a Server-Timing header, and requests slower than
+    TRACE_SLOW_MS are written to the trace file.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.trace = trace = RequestTrace(request.endpoint)
+        try:
+            response = make_response(f(*args, **kwargs))
+        finally:
+            g.trace = None
+        end = time.perf_counter()
+        response.headers["Server-Timing"] = trace.server_timing(end - trace.start)
+        if TRACE_SLOW_MS >= 0 and (end - trace.start) * 1000 >= TRACE_SLOW_MS:
+            write_trace(trace.events(end, {"path": request.full_path, "status": response.status_code}))
+        return response
+    return decorated_function
+
+class BoothRequest(Request):
+    """Request whose body limit is MAX_CONTENT_LENGTH, except for roll imports."""
+    @property
+    def max_content_length(self):
+        if self.endpoint == "admin_import_voters":
+            return IMPORT_MAX_UPLOAD_BYTES
+        return super().max_content_length
+
+APP.request_class = BoothRequest
+
+@APP.errorhandler(413)
+def request_too_large(e):
+    return jsonify(ok=False, detail="Upload too large."), 413
+
+@APP.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    profiler.request_started()
+
+@APP.teardown_request
+def _end_request(exc):
+    profiler.request_finished()
+
+@APP.after_request
+def _record_request_metrics(response):
+    """Counts and times every request by its route pattern (streamed bodies: until the headers)."""
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+    if "request_start" in g:
+        REQUEST_SECONDS.labels(route).observe(time.perf_counter() - g.request_start)
+    return response
+
+@APP.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint; sums all gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return APP.response_class(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+@APP.route("/readyz")
+def readyz():
+    """
+    Readiness probe: booth workers answer 503 until the detector warm-up has
+    finished; admin workers are ready as soon as they are serving.
+    """
+    if PROFILE == "booth" and not _warm_up_done.is_set():
+        start_warm_up()  # no-op if the post_fork hook already started it
+        return jsonify(ok=False, profile=PROFILE, pid=os.getpid(), **_warm_up_stats), 503, {"Retry-After": "1"}
+    return jsonify(ok=True, profile=PROFILE, pid=os.getpid(), warm_up_seconds=_warm_up_stats.get("seconds"))
+
 @APP.route("/api/verify_qr", methods=["POST"])
 def api_verify_qr():
     """API endpoint for QR code verification."""
@@ -822,14 +2362,15 @@ def api_verify_qr():
     voter_id = data.get("voter_id", "").strip()
     if not voter_id:
         return jsonify(ok=False, error="missing_voter_id"), 400
-    conn = get_conn()
-    r = conn.execute("SELECT * FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
-    conn.close()
+    r = voter_cache.get(voter_id)
     if not r:
+        VERIFICATIONS.labels("qr", "not_registered").inc()
         return jsonify(ok=False, error="not_registered", detail="Contact Admin or NOT Registered"), 404
     age = calculate_age(r["dob"])
     if age < 18:
+        VERIFICATIONS.labels("qr", "underage").inc()
         return jsonify(ok=False, error="underage", detail="BABY Your Not Eligible For Vote"), 403
+    VERIFICATIONS.labels("qr", "pass").inc()
     voter = {"voter_id": r["voter_id"], "name": r["name"], "dob": r["dob"], "phone": r["phone"], "has_voted": bool(r["has_voted"])}
     return jsonify(ok=True, voter=voter)
 
@@ -841,43 +2382,99 @@ def api_verify_fingerprint():
     fp_payload = data.get("fp_payload")
     if not voter_id or fp_payload is None:
         return jsonify(ok=False, error="missing_data"), 400
-    conn = get_conn()
-    r = conn.execute("SELECT fingerprint FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
-    conn.close()
+    r = voter_cache.get(voter_id)
     if not r:
+        VERIFICATIONS.labels("fingerprint", "not_registered").inc()
         return jsonify(ok=False, error="voter_not_found"), 404
     stored = r["fingerprint"] or ""
     ok = (fp_payload == stored)
+    VERIFICATIONS.labels("fingerprint", "pass" if ok else "fail").inc()
     return jsonify(ok=bool(ok))
 
+IMAGE_CONTENT_TYPES = ("image/jpeg", "image/png", "application/octet-stream")
+
+def read_face_upload(max_frames=1):
+    """
+    Reads the frame(s) of a face request in any of the supported encodings:
+    a raw image/jpeg (or png) body with fields in the query string, a
+    multipart form with one or more `image` file parts, or the legacy JSON
+    body with base64 `image_data` (or an `images` list). Returns
+    (fields, list of image bytes, error response).
+    """
+    too_large = (jsonify(ok=False, detail="Image too large."), 413)
+    if request.mimetype in IMAGE_CONTENT_TYPES:
+        frames = [request.stream.read(FACE_MAX_UPLOAD_BYTES + 1)]
+        fields = request.args
+    elif request.mimetype == "multipart/form-data":
+        frames = [upload.stream.read(FACE_MAX_UPLOAD_BYTES + 1)
+                  for upload in request.files.getlist("image")[:max_frames]]
+        fields = request.form
+    else:
+        with stage("json_parse"):
+            data = request.get_json(force=True)
+        encoded = data.get("images") or ([data["image_data"]] if data.get("image_data") else [])
+        if not isinstance(encoded, list) or any(not isinstance(e, str) for e in encoded):
+            return data, [], (jsonify(ok=False, detail="Malformed image data."), 400)
+        if any(len(e) > FACE_MAX_UPLOAD_BYTES * 4 // 3 + 4 for e in encoded):
+            return data, [], too_large
+        frames = []
+        for e in encoded[:max_frames]:
+            try:
+                with stage("b64_decode"):
+                    frames.append(base64.b64decode(e))
+            except ValueError:
+                frames.append(b"")
+        fields = data
+    if any(len(frame) > FACE_MAX_UPLOAD_BYTES for frame in frames):
+        return fields, [], too_large
+    return fields, [frame for frame in frames if frame], None
+
 @APP.route("/api/enroll_face", methods=["POST"])
+@require_admin
+@traced
+@inference_route
 def api_enroll_face():
-    """API endpoint to process and enroll a face image from the admin UI."""
-    data = request.get_json(force=True)
-    image_data = data.get("image_data")
-    if not image_data:
+    """
+    Admin API endpoint to process and enroll a face image. Admin-only: the
+    duplicate list names the voters a photo matches.
+    """
+    with stage("read_upload"):
+        _, frames, error = read_face_upload()
+    if error:
+        return error
+    if not frames:
         return jsonify(ok=False, detail="No image data provided."), 400
     
-    face_data = get_face_data(image_data)
+    face_data = face_data_from_bytes(frames[0])
     if face_data:
+        with stage("duplicate_search"):
+            duplicates = find_duplicate_faces(decode_face_template(face_data))
+        if duplicates:
+            logging.warning("Enrollment face matches %d enrolled voter(s).", len(duplicates))
         # Return the serialized data to the frontend to be saved with the form
-        return jsonify(ok=True, face_data=base64.b64encode(face_data).decode('utf-8'))
+        return jsonify(ok=True, face_data=base64.b64encode(face_data).decode('utf-8'), duplicates=duplicates)
     else:
         return jsonify(ok=False, detail="No face detected in the image."), 400
 
 @APP.route("/api/verify_face", methods=["POST"])
+@traced
+@inference_route
 def api_verify_face():
-    """API endpoint to verify a voter's face against the stored data."""
-    data = request.get_json(force=True)
+    """
+    API endpoint to verify a voter's face against the stored data. Accepts a
+    burst of up to FACE_MAX_BURST frames; stops at the first frame that
+    matches and otherwise reports the best score, with per-frame timings.
+    """
+    with stage("read_upload"):
+        data, frames, error = read_face_upload(FACE_MAX_BURST)
+    if error:
+        return error
     voter_id = data.get("voter_id")
-    image_data = data.get("image_data")
     
-    if not voter_id or not image_data:
+    if not voter_id or not frames:
         return jsonify(ok=False, detail="Missing voter ID or image data."), 400
     
-    conn = get_conn()
-    r = conn.execute("SELECT face_data, has_voted FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
-    conn.close()
+    r = voter_cache.get(voter_id)
     
     if not r:
         return jsonify(ok=False, detail="Voter not found."), 404
@@ -885,75 +2482,488 @@ def api_verify_face():
     if r["has_voted"]:
         return jsonify(ok=False, detail="This voter has already voted."), 403
     
-    stored_face_data = r["face_data"]
-    if not stored_face_data:
+    stored_face_data = r["face"]
+    if stored_face_data is None:
         return jsonify(ok=False, detail="No face data enrolled for this voter."), 404
     
     try:
-        live_face_data = get_face_data(image_data)
-        if not live_face_data:
-            return jsonify(ok=False, detail="No face detected in the live image."), 400
-        
-        # Need to decode the stored base64 data first before passing to compare_faces
-        stored_face_bytes = base64.b64decode(stored_face_data)
+        results = []
+        matched = False
+        start = time.perf_counter()
+        for index, live_face_data in enumerate(face_data_from_frames(frames)):
+            distance = face_distance(stored_face_data, live_face_data) if live_face_data else None
+            now = time.perf_counter()
+            results.append({"frame": index, "face": live_face_data is not None,
+                            "distance": None if distance is None else round(distance, 4),
+                            "ms": round((now - start) * 1000, 2)})
+            start = now
+            if distance is not None and distance < FACE_MATCH_THRESHOLD:
+                matched = True
+                break
+        scores = [f["distance"] for f in results if f["distance"] is not None]
+        best = min(scores) if scores else None
+        log_success("face_distance", "Face comparison distances for %s: %s", voter_id, scores)
         
-        if compare_faces(stored_face_bytes, live_face_data):
-            logging.info(f"Voter {voter_id} facial verification successful.")
-            return jsonify(ok=True)
+        if matched:
+            VERIFICATIONS.labels("face", "pass").inc()
+            log_success("face_verified", "Voter %s facial verification successful.", voter_id)
+            return jsonify(ok=True, frames=results, best_distance=best)
+        elif best is None:
+            VERIFICATIONS.labels("face", "no_face").inc()
+            return jsonify(ok=False, detail="No face detected in the live image.", frames=results), 400
         else:
-            logging.warning(f"Voter {voter_id} facial verification failed.")
-            return jsonify(ok=False, detail="Facial recognition failed. Please try again or contact an administrator.")
+            VERIFICATIONS.labels("face", "fail").inc()
+            logging.warning("Voter %s facial verification failed.", voter_id)
+            return jsonify(ok=False, detail="Facial recognition failed. Please try again or contact an administrator.",
+                           frames=results, best_distance=best)
     except Exception as e:
-        logging.error(f"Error during face verification for voter {voter_id}: {e}")
+        logging.error("Error during face verification for voter %s: %s", voter_id, e)
         return jsonify(ok=False, detail="An error occurred during facial verification."), 500
 
+def _request_socket():
+    """The client connection under gunicorn or the Werkzeug server (None elsewhere, e.g. in tests)."""
+    return request.environ.get("gunicorn.socket") or request.environ.get("werkzeug.socket")
+
+def _read_frame(stream):
+    """One length-prefixed frame (see the inference wire format), or None at the end of the body."""
+    prefix = stream.read(4)
+    if len(prefix) < 4:
+        return None
+    size = int.from_bytes(prefix, "big")
+    if size > FACE_MAX_UPLOAD_BYTES:
+        raise ValueError("frame too large")
+    frame = stream.read(size)
+    return frame if len(frame) == size else None
+
+class LatestFrameReader:
+    """
+    Reads a request body of length-prefixed frames on a background thread and
+    keeps only the newest unclaimed frame, so frames that queue up behind a
+    slow detection are dropped rather than processed late. next() waits no
+    longer than a deadline however slowly the client sends; close() stops
+    the reader by shutting down the socket's read side (the connection then
+    closes after the response).
+    """
+    def __init__(self, stream, sock=None):
+        self._sock = sock
+        self._cond = threading.Condition()
+        self._frame, self._dropped, self._done, self._error = None, 0, False, None
+        self._thread = threading.Thread(target=self._run, args=(stream,), name="face-stream", daemon=True)
+        self._thread.start()
+
+    def _run(self, stream):
+        try:
+            while True:
+                frame = _read_frame(stream)
+                with self._cond:
+                    if frame is None:
+                        break
+                    self._dropped += self._frame is not None
+                    self._frame = frame
+                    self._cond.notify()
+        except ClientDisconnected:
+            pass  # the client went away, or close() shut the socket
+        except Exception as e:
+            self._error = e
+        with self._cond:
+            self._done = True
+            self._cond.notify()
+
+    def next(self, deadline):
+        """(frame, frames dropped before it), or None once the body ends or `deadline` passes."""
+        with self._cond:
+            while self._frame is None and not self._done:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._frame is None:
+                if self._error is not None:
+                    raise self._error
+                return None
+            frame, dropped = self._frame, self._dropped
+            self._frame, self._dropped = None, 0
+            return frame, dropped
+
+    def close(self):
+        if self._thread.is_alive() and self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        self._thread.join(timeout=1)
+
+@APP.route("/api/verify_face/stream", methods=["POST"])
+@traced
+def api_verify_face_stream():
+    """
+    Streaming face verification. The booth page keeps one chunked request
+    open and sends downscaled, length-prefixed JPEG frames; the response is
+    returned as soon as one frame matches, or when the stream ends or times
+    out, even if the client stalls. Frames arriving faster than
+    FACE_STREAM_FPS are skipped, frames that queued up during a detection
+    are dropped for the newest, and each detection reuses the previous
+    frame's face box as its search region. Each detection takes its own
+    inference_gate slot, so a stream never holds one while waiting on the
+    network; a frame turned away by the gate is skipped.
+    """
+    voter_id = request.args.get("voter_id")
+    if not voter_id:
+        return jsonify(ok=False, detail="Missing voter ID."), 400
+    
+    r = voter_cache.get(voter_id)
+    if not r:
+        return jsonify(ok=False, detail="Voter not found."), 404
+    if r["has_voted"]:
+        return jsonify(ok=False, detail="This voter has already voted."), 403
+    if r["face"] is None:
+        return jsonify(ok=False, detail="No face data enrolled for this voter."), 404
+    
+    start = time.monotonic()
+    deadline = start + FACE_STREAM_TIMEOUT
+    interval = 1 / FACE_STREAM_FPS
+    next_slot = start
+    roi = None
+    results, skipped, shed, best = [], 0, 0, None
+    frames = LatestFrameReader(request.stream, _request_socket())
+    try:
+        while (item := frames.next(deadline)) is not None:
+            frame, dropped = item
+            skipped += dropped
+            now = time.monotonic()
+            if now < next_slot:
+                skipped += 1
+                continue
+            next_slot = now + interval
+            if not admit_inference():
+                skipped += 1
+                shed += 1
+                continue
+            try:
+                if INFERENCE_SOCKET:
+                    live_face_data, roi = face_data_from_bytes(frame), None
+                else:
+                    live_face_data, roi = detect_face(frame, roi)
+            finally:
+                release_inference()
+            distance = face_distance(r["face"], live_face_data) if live_face_data else None
+            results.append({"frame": len(results) + skipped, "face": live_face_data is not None,
+                            "distance": None if distance is None else round(distance, 4),
+                            "ms": round((time.monotonic() - now) * 1000, 2)})
+            if distance is not None and (best is None or distance < best):
+                best = round(distance, 4)
+            if distance is not None and distance < FACE_MATCH_THRESHOLD:
+                VERIFICATIONS.labels("face", "pass").inc()
+                elapsed = round((time.monotonic() - start) * 1000, 1)
+                log_success("face_verified", "Voter %s facial verification successful after %d frame(s), %s ms.",
+                            voter_id, len(results), elapsed)
+                return jsonify(ok=True, frames=results, skipped=skipped, best_distance=best, elapsed_ms=elapsed)
+    except ValueError:
+        return jsonify(ok=False, detail="Image too large."), 413
+    except HTTPException:
+        raise  # e.g. 413 once the body passes MAX_CONTENT_LENGTH
+    except Exception as e:
+        logging.error("Error during streaming face verification for voter %s: %s", voter_id, e)
+        return jsonify(ok=False, detail="An error occurred during facial verification."), 500
+    finally:
+        frames.close()
+    
+    if shed and not results:
+        logging.warning("Shedding %s: inference queue full in worker %d.", request.path, os.getpid())
+        return busy_response()
+    VERIFICATIONS.labels("face", "fail" if best is not None else "no_face").inc()
+    logging.warning("Voter %s streaming facial verification failed after %d frame(s).", voter_id, len(results))
+    detail = "No face detected in the live image." if best is None else \
+        "Facial recognition failed. Please try again or contact an administrator."
+    return jsonify(ok=False, detail=detail, frames=results, skipped=skipped, best_distance=best,
+                   elapsed_ms=round((time.monotonic() - start) * 1000, 1))
+
+def _claim_and_record(conn, voter_id, candidate):
+    """
+    Claims the voter, inserts the vote and bumps the candidate's tally; the
+    caller owns the transaction.
+    The conditional UPDATE is the only has_voted check, so concurrent workers
+    cannot both claim the same voter. Returns "ok", "already_voted" or "not_found".
+    """
+    claimed = conn.execute("UPDATE voters SET has_voted=1 WHERE voter_id=? AND has_voted=0",
+                           (voter_id,)).rowcount
+    if not claimed:
+        exists = conn.execute("SELECT 1 FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
+        return "already_voted" if exists else "not_found"
+    now = datetime.utcnow()
+    conn.execute("INSERT INTO votes (voter_id, candidate, timestamp, ts_epoch) VALUES (?, ?, ?, ?)",
+                 (voter_id, candidate, now.isoformat(), int(now.replace(tzinfo=timezone.utc).timestamp())))
+    conn.execute("INSERT INTO tallies (candidate, count) VALUES (?, 1) "
+                 "ON CONFLICT(candidate) DO UPDATE SET count = count + 1", (candidate,))
+    return "ok"
+
+def record_vote(conn, voter_id, candidate):
+    """Records a single vote in its own short BEGIN IMMEDIATE transaction."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        with stage("db_query"):
+            status = _claim_and_record(conn, voter_id, candidate)
+        with stage("db_commit"):
+            conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return status
+
+class _PendingVote:
+    __slots__ = ("voter_id", "candidate", "done", "status", "error")
+
+    def __init__(self, voter_id, candidate):
+        self.voter_id = voter_id
+        self.candidate = candidate
+        self.done = threading.Event()
+        self.status = None
+        self.error = None
+
+class VoteWriterUnavailable(Exception):
+    """The group-commit writer could not confirm a vote (writer failure or timeout)."""
+
+class VoteWriter:
+    """
+    Group-commit vote writer for one shard. Request threads submit() a vote and block; a
+    single writer thread drains the queue into batches of up to `max_batch`
+    votes (or whatever arrived within `max_wait_ms` of the first one) and
+    commits each batch with one fsync before waking the submitters.
+    """
+    def __init__(self, max_batch, max_wait_ms, shard=0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.shard = shard
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each worker starts its own writer;
+        # a writer that died is restarted on the same queue.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is not None:
+                    logging.error("Vote writer for shard %d died; restarting it.", self.shard)
+                self._thread = threading.Thread(target=self._run, name=f"vote-writer-{self.shard}",
+                                                daemon=True)
+                self._thread.start()
+
+    def submit(self, voter_id, candidate, timeout=GROUP_COMMIT_TIMEOUT):
+        """
+        Queues a vote and waits until its batch is durable; returns the
+        record_vote() status. Raises sqlite3.Error if the batch failed, or
+        VoteWriterUnavailable if the writer failed otherwise or did not answer
+        within `timeout` seconds (the vote may still be committed later).
+        """
+        self._ensure_started()
+        pending = _PendingVote(voter_id, candidate)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise VoteWriterUnavailable(f"no confirmation from the vote writer within {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.status
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = self._next_batch()
+            try:
+                if conn is None:
+                    conn = _connect(self.shard)
+                    conn.execute("PRAGMA synchronous=FULL")  # a batch is acknowledged only once fsynced
+                conn.execute("BEGIN IMMEDIATE")
+                with stage("db_query"):
+                    for pending in batch:
+                        pending.status = _claim_and_record(conn, pending.voter_id, pending.candidate)
+                with stage("db_commit"):
+                    conn.commit()
+            except sqlite3.Error as e:
+                # Includes failing to open the connection; the batch fails at
+                # once and the next batch starts on a fresh connection.
+                if conn is not None:
+                    try:
+                        conn.rollback()
+                        conn.close()
+                    except sqlite3.Error:
+                        pass
+                    conn = None
+                logging.error("Group commit of %d votes failed: %s", len(batch), e)
+                for pending in batch:
+                    pending.error = e
+            except Exception as e:
+                # Anything else fails this batch only, on a fresh connection next time.
+                logging.exception("Vote writer for shard %d failed a batch of %d votes", self.shard, len(batch))
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+                for pending in batch:
+                    pending.error = VoteWriterUnavailable(str(e))
+            for pending in batch:
+                pending.done.set()
+
+_vote_writers = [VoteWriter(GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_WAIT_MS, shard)
+                 for shard in range(DB_SHARDS)]
+
 @APP.route("/api/cast_vote", methods=["POST"])
+@traced
 def api_cast_vote():
     """API endpoint to cast a vote."""
-    data = request.get_json(force=True)
+    with stage("json_parse"):
+        data = request.get_json(force=True)
     voter_id = data.get("voter_id")
     candidate = data.get("candidate")
     
     if not voter_id or not candidate:
         return jsonify(ok=False, detail="Missing voter ID or candidate."), 400
         
-    conn = get_conn()
     try:
-        # Check if voter has already voted
-        voter_row = conn.execute("SELECT has_voted FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
-        if not voter_row:
-            return jsonify(ok=False, detail="Voter not found."), 404
-        if voter_row["has_voted"]:
-            return jsonify(ok=False, detail="Voter has already cast their vote."), 403
-
-        # Record the vote
-        conn.execute("INSERT INTO votes (voter_id, candidate, timestamp) VALUES (?, ?, ?)",
-                    (voter_id, candidate, datetime.utcnow().isoformat()))
-        
-        # Update voter status
-        conn.execute("UPDATE voters SET has_voted=1 WHERE voter_id=?", (voter_id,))
-        
-        conn.commit()
-        logging.info(f"Voter {voter_id} cast a vote for {candidate}.")
-        return jsonify(ok=True)
+        if GROUP_COMMIT:
+            with stage("vote_queue_wait"):
+                status = _vote_writers[shard_for(voter_id)].submit(voter_id, candidate)
+        else:
+            conn = get_conn(voter_id)
+            try:
+                status = record_vote(conn, voter_id, candidate)
+            finally:
+                conn.close()
     except sqlite3.Error as e:
-        conn.rollback()
-        logging.error(f"Database error casting vote for {voter_id}: {e}")
+        count_db_error(e)
+        VOTES.labels("error").inc()
+        logging.error("Database error casting vote for %s: %s", voter_id, e)
         return jsonify(ok=False, detail="Database error."), 500
-    finally:
-        conn.close()
+    except VoteWriterUnavailable as e:
+        VOTES.labels("error").inc()
+        logging.error("Vote writer unavailable for %s: %s", voter_id, e)
+        return jsonify(ok=False, detail="Vote recording is temporarily unavailable; please retry."), 503, \
+            {"Retry-After": "1"}
 
-# --- Admin Routes ---
+    VOTES.labels(status).inc()
+    if status == "not_found":
+        return jsonify(ok=False, detail="Voter not found."), 404
+    voter_cache.mark_voted(voter_id)
+    if status == "already_voted":
+        return jsonify(ok=False, detail="Voter has already cast their vote."), 403
+    log_success("vote_cast", "Voter %s cast a vote for %s.", voter_id, candidate)
+    return jsonify(ok=True)
 
-def require_admin(f):
-    """Decorator to protect admin routes."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if session.get("logged_in"):
-            return f(*args, **kwargs)
-        flash("Please log in to access this page.", "error")
-        return redirect(url_for("admin_login"))
-    return decorated_function
+# --- Sampling profiler ---
+class SamplingProfiler:
+    """
+    Statistical profiler for this worker. run() samples the Python stacks of
+    the threads serving requests (or of every thread) from the calling thread
+    every `interval` seconds. While it is off nothing runs; requests only
+    mark their thread as busy in a dict. One run at a time per worker.
+    """
+    def __init__(self):
+        self._run_lock = threading.Lock()
+        self.active = False
+        self._threads = {}
+        self._finished = 0
+
+    def request_started(self):
+        self._threads[threading.get_ident()] = True
+
+    def request_finished(self):
+        self._threads.pop(threading.get_ident(), None)
+        if self.active:
+            self._finished += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def run(self, seconds, requests=None, interval=0.01, all_threads=False):
+        """
+        Samples for `seconds`, or until `requests` more requests have finished
+        (capped at `seconds`). Returns (collapsed stack counts, samples taken,
+        seconds elapsed); raises RuntimeError if a run is already in progress.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("a profile is already running in this worker")
+        try:
+            me = threading.get_ident()
+            self._finished = 0
+            self.active = True
+            stacks, samples = StackCounter(), 0
+            start = time.monotonic()
+            deadline = start + seconds
+            while time.monotonic() < deadline and (requests is None or self._finished < requests):
+                wanted = None if all_threads else set(self._threads)
+                for tid, frame in sys._current_frames().items():
+                    if tid != me and (wanted is None or tid in wanted):
+                        stacks[self._collapse(frame)] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples, time.monotonic() - start
+        finally:
+            self.active = False
+            self._run_lock.release()
+
+profiler = SamplingProfiler()
+
+def flame_graph_svg(stacks, title):
+    """Renders collapsed stack counts as a self-contained flame graph SVG (hover for details)."""
+    root = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["count"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += count
+    total = root["count"] or 1
+    width, row = 1200, 17
+
+    def depth(node):
+        return 1 + max((depth(c) for c in node["children"].values()), default=0)
+    height = (depth(root) + 1) * row + 30
+    rects = []
+
+    def layout(node, x, level):
+        for name, child in sorted(node["children"].items()):
+            w = child["count"] / total * width
+            if w >= 0.5:
+                y = height - (level + 1) * row
+                hue = zlib.crc32(name.encode()) % 55
+                label = html.escape(name)
+                tip = f"{label} — {child['count']} samples ({child['count'] / total:.1%})"
+                text = html.escape(name[:int(w / 7)]) if w > 21 else ""
+                rects.append(f'<g><title>{tip}</title><rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" '
+                             f'fill="hsl({hue},85%,60%)"/><text x="{x + 3:.1f}" y="{y + 12}">{text}</text></g>')
+                layout(child, x, level + 1)
+            x += w
+    layout(root, 0.0, 0)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'font-family="monospace" font-size="11">'
+            f'<text x="4" y="18" font-size="14">{html.escape(title)}</text>{"".join(rects)}</svg>')
+
+# --- Admin Routes ---
 
 @APP.route("/admin", methods=["GET", "POST"])
 @APP.route("/admin/login", methods=["GET", "POST"])
@@ -978,10 +2988,59 @@ def admin_logout():
 @APP.route("/admin/list")
 @require_admin
 def admin_list_voters():
-    conn = get_conn()
-    voters = conn.execute("SELECT * FROM voters ORDER BY created_at DESC").fetchall()
-    conn.close()
-    return render_template_string(ADMIN_LIST_HTML, voters=voters)
+    """Streams one keyset page of voters, newest first, without biometric columns."""
+    limit = min(max(request.args.get("limit", ADMIN_PAGE_SIZE, type=int), 1), ADMIN_MAX_PAGE_SIZE)
+    cursor_ts = request.args.get("cursor_ts")
+    cursor_id = request.args.get("cursor_id", type=int)
+    cursor_shard = request.args.get("cursor_shard", 0, type=int)
+    # Pop flashes now: session changes made while the body streams are not saved.
+    get_flashed_messages(with_categories=True)
+    voters = iter_voter_page(limit, cursor_ts, cursor_id, cursor_shard)
+    return APP.response_class(_buffered(stream_template_string(ADMIN_LIST_HTML, voters=voters, limit=limit)),
+                              mimetype="text/html")
+
+VOTER_LIST_COLUMNS = "id, voter_id, name, dob, phone, has_voted, created_at"
+
+def iter_voter_page(limit, cursor_ts=None, cursor_id=None, cursor_shard=0):
+    """
+    Yields up to `limit` voters after the cursor in (created_at, id, shard)
+    descending order. Each shard returns its own next `limit` rows; they are
+    merged lazily. The shard index breaks ties between shards' row ids.
+    """
+    conns = [get_conn(shard=shard) for shard in range(DB_SHARDS)]
+    try:
+        cursors = []
+        for shard, conn in enumerate(conns):
+            columns = f"{VOTER_LIST_COLUMNS}, {shard} AS shard"
+            if cursor_ts is None or cursor_id is None:
+                cursors.append(conn.execute(f"SELECT {columns} FROM voters "
+                                            "ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)))
+            else:
+                op = "<" if shard >= cursor_shard else "<="
+                cursors.append(conn.execute(f"SELECT {columns} FROM voters WHERE (created_at, id) {op} (?, ?) "
+                                            "ORDER BY created_at DESC, id DESC LIMIT ?",
+                                            (cursor_ts, cursor_id, limit)))
+        if len(cursors) == 1:
+            yield from cursors[0]
+        else:
+            merged = heapq.merge(*cursors, key=lambda r: (r["created_at"] or "", r["id"], r["shard"]),
+                                 reverse=True)
+            yield from islice(merged, limit)
+    finally:
+        for conn in conns:
+            conn.close()
+
+def _buffered(chunks, size=16384):
+    """Coalesces the many small strings a streamed template yields into larger writes."""
+    buf, buffered = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield "".join(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield "".join(buf)
 
 @APP.route("/admin/add", methods=["GET", "POST"])
 @require_admin
@@ -993,17 +3052,27 @@ def admin_add_voter():
         phone = request.form.get("phone")
         fingerprint = request.form.get("fingerprint")
         face_data = request.form.get("face_data")
-        created_at = datetime.utcnow().isoformat()
+        now = datetime.utcnow()
+        created_at = now.isoformat()
         
         if not voter_id or not name or not dob:
             flash("Voter ID, Name, and DOB are required.", "error")
             return redirect(url_for("admin_add_voter"))
+        try:
+            face_data = face_template_from_form(face_data)
+        except ValueError:
+            flash("Captured face data is invalid; please capture the face again.", "error")
+            return redirect(url_for("admin_add_voter"))
         
-        conn = get_conn()
+        conn = get_conn(voter_id)
         try:
-            conn.execute("INSERT INTO voters (voter_id, name, dob, phone, fingerprint, face_data, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                         (voter_id, name, dob, phone, fingerprint, face_data, created_at))
+            cur = conn.execute("INSERT INTO voters (voter_id, name, dob, phone, fingerprint, face_data, created_at, created_epoch) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (voter_id, name, dob, phone, fingerprint, face_data, created_at,
+                                int(now.replace(tzinfo=timezone.utc).timestamp())))
             conn.commit()
+            if face_data:
+                face_index.add_many([(FaceIndex.key(shard_for(voter_id), cur.lastrowid),
+                                      decode_face_template(face_data))])
             flash(f"Voter {voter_id} added successfully.", "success")
         except sqlite3.IntegrityError:
             flash(f"Voter ID '{voter_id}' already exists.", "error")
@@ -1015,10 +3084,21 @@ def admin_add_voter():
     
     return render_template_string(ADMIN_ADD_HTML)
 
+def face_template_from_form(value):
+    """Decodes the base64 face template posted by the enrollment form (None if empty)."""
+    if not value:
+        return None
+    try:
+        template = base64.b64decode(value, validate=True)
+    except ValueError:
+        raise ValueError("face data is not valid base64")
+    decode_face_template(template)
+    return template
+
 @APP.route("/admin/edit/<voter_id>", methods=["GET", "POST"])
 @require_admin
 def admin_edit_voter(voter_id):
-    conn = get_conn()
+    conn = get_conn(voter_id)
     voter = conn.execute("SELECT * FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
     
     if not voter:
@@ -1031,13 +3111,14 @@ def admin_edit_voter(voter_id):
         dob = request.form.get("dob")
         phone = request.form.get("phone")
         fingerprint = request.form.get("fingerprint")
-        face_data = request.form.get("face_data") # Retain existing face_data
         
         if not name or not dob:
             flash("Name and DOB are required.", "error")
         else:
-            conn.execute("UPDATE voters SET name=?, dob=?, phone=?, fingerprint=?, face_data=? WHERE voter_id=?",
-                         (name, dob, phone, fingerprint, face_data, voter_id))
+            # face_data is left untouched; the edit form does not round-trip the template.
+            conn.execute("UPDATE voters SET name=?, dob=?, phone=?, fingerprint=? WHERE voter_id=?",
+                         (name, dob, phone, fingerprint, voter_id))
+            bump_voters_generation(conn)
             conn.commit()
             flash(f"Voter '{voter_id}' updated successfully.", "success")
             return redirect(url_for("admin_list_voters"))
@@ -1048,10 +3129,14 @@ def admin_edit_voter(voter_id):
 @APP.route("/admin/delete/<voter_id>", methods=["POST"])
 @require_admin
 def admin_delete_voter(voter_id):
-    conn = get_conn()
+    conn = get_conn(voter_id)
+    row = conn.execute("SELECT id FROM voters WHERE voter_id=?", (voter_id,)).fetchone()
     conn.execute("DELETE FROM voters WHERE voter_id=?", (voter_id,))
+    bump_voters_generation(conn)
     conn.commit()
     conn.close()
+    if row:
+        face_index.remove(FaceIndex.key(shard_for(voter_id), row["id"]))
     flash(f"Voter '{voter_id}' deleted successfully.", "success")
     return redirect(url_for("admin_list_voters"))
 
@@ -1059,9 +3144,10 @@ def admin_delete_voter(voter_id):
 @require_admin
 def admin_reset_voter(voter_id):
     """Admin route to reset a voter's has_voted status."""
-    conn = get_conn()
+    conn = get_conn(voter_id)
     try:
         conn.execute("UPDATE voters SET has_voted = 0 WHERE voter_id = ?", (voter_id,))
+        bump_voters_generation(conn)
         conn.commit()
         flash(f"Vote status for '{voter_id}' has been reset.", "success")
     except sqlite3.Error as e:
@@ -1071,6 +3157,595 @@ def admin_reset_voter(voter_id):
         conn.close()
     return redirect(url_for("admin_list_voters"))
 
+@APP.route("/admin/import", methods=["POST"])
+@require_admin
+def admin_import_voters():
+    """
+    Admin endpoint for bulk roll import: multipart upload of a `roll` file
+    (CSV or JSONL) plus any number of `photos` files matched by filename.
+    The import runs in the background; poll the returned status_url. Very
+    large rolls are better loaded with `flask --app app import-voters`.
+    """
+    roll = request.files.get("roll")
+    if not roll or not roll.filename:
+        return jsonify(ok=False, detail="No roll file uploaded."), 400
+    job_id, started = start_import_job(roll, request.files.getlist("photos"),
+                                       request.form.get("batch_size", 2000, type=int))
+    status_url = url_for("admin_import_status", job_id=job_id)
+    if not started:
+        return jsonify(ok=False, detail="This roll is already being imported.", job=job_id,
+                       status_url=status_url), 409
+    return jsonify(ok=True, job=job_id, status_url=status_url), 202
+
+@APP.route("/admin/import/<job_id>")
+@require_admin
+def admin_import_status(job_id):
+    """Admin API endpoint reporting a background import: running, done (with report) or failed."""
+    if len(job_id) != 64 or job_id.strip("0123456789abcdef"):
+        abort(404)
+    try:
+        status = json.loads((IMPORT_DIR / job_id / "status.json").read_text())
+    except (OSError, ValueError):
+        abort(404)
+    return jsonify(ok=True, job=job_id, **status)
+
+@APP.route("/admin/export/<table>.<fmt>")
+@require_admin
+def admin_export(table, fmt):
+    """
+    Streams a full dump of `votes` or `voters` as CSV or NDJSON. Query args:
+    gzip=1 compresses the stream, biometrics=1 includes face/fingerprint data.
+    """
+    if table not in EXPORT_TABLES or fmt not in ("csv", "ndjson"):
+        abort(404)
+    compress = request.args.get("gzip") == "1"
+    chunks = iter_export(table, fmt, include_biometrics=request.args.get("biometrics") == "1")
+    filename = f"{table}.{fmt}" + (".gz" if compress else "")
+    mimetype = "application/gzip" if compress else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+    body = _gzipped(chunks) if compress else chunks
+    logging.info("Export of %s as %s started.", table, filename)
+    return APP.response_class(stream_with_context(body), mimetype=mimetype,
+                              headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@APP.route("/admin/cache_stats")
+@require_admin
+def admin_cache_stats():
+    """Admin API endpoint exposing this worker's voter cache counters."""
+    return jsonify(ok=True, pid=os.getpid(), voter_cache=voter_cache.stats())
+
+@APP.route("/admin/admission_stats")
+@require_admin
+def admin_admission_stats():
+    """Admin API endpoint exposing this worker's inference queue depth and shed counts."""
+    return jsonify(ok=True, pid=os.getpid(), inference=inference_gate.stats())
+
+@APP.route("/admin/profile")
+@require_admin
+def admin_profile():
+    """
+    Profiles this worker with the sampling profiler for ?seconds=N (default 10)
+    or until ?requests=N more requests finish, and returns collapsed stacks
+    (?format=collapsed, the default; flamegraph.pl compatible) or a flame
+    graph (?format=svg). ?interval_ms sets the sampling period and
+    ?all_threads=1 includes background threads. Only the worker that receives
+    this request is profiled; its pid is in the X-Profiled-Pid header.
+    """
+    seconds = min(max(request.args.get("seconds", 10, type=float), 0.1), PROFILE_MAX_SECONDS)
+    requests_wanted = request.args.get("requests", type=int)
+    if requests_wanted is not None and "seconds" not in request.args:
+        seconds = PROFILE_MAX_SECONDS
+    interval = max(request.args.get("interval_ms", 10, type=float), 1) / 1000
+    fmt = request.args.get("format", "collapsed")
+    if fmt not in ("collapsed", "svg"):
+        return jsonify(ok=False, detail="format must be collapsed or svg."), 400
+    try:
+        stacks, samples, elapsed = profiler.run(seconds, requests_wanted, interval,
+                                                request.args.get("all_threads") == "1")
+    except RuntimeError as e:
+        return jsonify(ok=False, detail=str(e)), 409
+    logging.info("Profiled worker %d for %.1fs: %d samples, %d stacks.", os.getpid(), elapsed, samples,
+                 sum(stacks.values()))
+    headers = {"X-Profiled-Pid": str(os.getpid()), "X-Profile-Samples": str(samples)}
+    if fmt == "svg":
+        title = f"worker {os.getpid()}: {elapsed:.1f}s, {sum(stacks.values())} stack samples"
+        return APP.response_class(flame_graph_svg(stacks, title), mimetype="image/svg+xml", headers=headers)
+    body = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    return APP.response_class(body, mimetype="text/plain", headers=headers)
+
+@APP.route("/api/results")
+@require_admin
+def api_results():
+    """Admin API endpoint returning per-candidate totals from the tallies table(s)."""
+    totals = {}
+    for shard in range(DB_SHARDS):
+        conn = get_conn(shard=shard)
+        for r in conn.execute("SELECT candidate, count FROM tallies"):
+            totals[r["candidate"]] = totals.get(r["candidate"], 0) + r["count"]
+        conn.close()
+    results = [{"candidate": cand, "count": count}
+               for cand, count in sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))]
+    return jsonify(ok=True, results=results, total=sum(r["count"] for r in results))
+
+# --- CLI commands (flask --app app <command>) ---
+
+def reconcile_tallies(chunk_size=50000, fix=False, shard=0):
+    """
+    Recounts one shard's `votes` in primary-key chunks and compares the result with
+    `tallies`. The bulk of the scan runs without holding the write lock; only
+    the votes that arrived during the scan are counted under BEGIN IMMEDIATE,
+    where tallies are compared (and, with fix=True, rewritten) atomically.
+    Returns {candidate: (tally, recount)} for every candidate that drifted.
+    """
+    conn = get_conn(shard=shard)
+    try:
+        counts = {}
+        last_id = 0
+        high_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM votes").fetchone()[0]
+        while last_id < high_id:
+            upper = min(last_id + chunk_size, high_id)
+            for r in conn.execute("SELECT candidate, COUNT(*) AS n FROM votes WHERE id > ? AND id <= ? "
+                                  "GROUP BY candidate", (last_id, upper)):
+                counts[r["candidate"]] = counts.get(r["candidate"], 0) + r["n"]
+            last_id = upper
+
+        conn.execute("BEGIN IMMEDIATE")
+        for r in conn.execute("SELECT candidate, COUNT(*) AS n FROM votes WHERE id > ? GROUP BY candidate",
+                              (high_id,)):
+            counts[r["candidate"]] = counts.get(r["candidate"], 0) + r["n"]
+        tallies = {r["candidate"]: r["count"] for r in conn.execute("SELECT candidate, count FROM tallies")}
+        drift = {cand: (tallies.get(cand, 0), counts.get(cand, 0))
+                 for cand in set(tallies) | set(counts)
+                 if tallies.get(cand, 0) != counts.get(cand, 0)}
+        if fix and drift:
+            conn.execute("DELETE FROM tallies")
+            conn.executemany("INSERT INTO tallies (candidate, count) VALUES (?, ?)", counts.items())
+        conn.commit()
+        return drift
+    finally:
+        conn.close()
+
+@APP.cli.command("migrate")
+def migrate_command():
+    """Applies pending schema migrations to every shard."""
+    check_shard_layout()
+    for shard in range(DB_SHARDS):
+        conn = get_conn(shard=shard)
+        before = _user_version(conn)
+        conn.close()
+        migrate_shard(shard)
+        click.echo(f"{shard_path(shard).name}: schema v{before} -> v{SCHEMA_VERSION}")
+
+@APP.cli.command("rebuild-face-index")
+def rebuild_face_index_command():
+    """Rebuilds the shared face index from the voters table(s), dropping deleted slots."""
+    face_index.build(_iter_enrolled_faces())
+    header, _, _ = face_index._reader()
+    click.echo(f"{face_index.path.name}: {int(header[3])} face templates indexed.")
+
+def _reshard_copy(source, targets, table, columns, chunk_size):
+    """Copies one table of a source file into the target shard files, in id order."""
+    select = f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?"
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    voter_col = columns.index("voter_id")
+    last_id, copied = 0, 0
+    while True:
+        rows = source.execute(select, (last_id, chunk_size)).fetchall()
+        if not rows:
+            return copied
+        last_id = rows[-1][0]
+        by_shard = {}
+        for r in rows:
+            by_shard.setdefault(shard_for(r[1 + voter_col]), []).append(r[1:])
+        for shard, batch in by_shard.items():
+            targets[shard].executemany(insert, batch)
+        copied += len(rows)
+
+@APP.cli.command("reshard")
+@click.option("--from-shards", type=int, required=True, help="SVM_DB_SHARDS the existing files were written with.")
+@click.option("--chunk-size", default=5000, show_default=True, help="Rows copied per chunk.")
+def reshard_command(from_shards, chunk_size):
+    """
+    Redistributes voters and votes from a FROM_SHARDS layout into the
+    configured SVM_DB_SHARDS layout. Stop every worker first. The old files
+    are kept as *.pre-reshard-FROM_SHARDS backups and the face index is rebuilt.
+    """
+    if from_shards < 1 or from_shards == DB_SHARDS:
+        raise click.UsageError(f"--from-shards must be a positive count other than {DB_SHARDS}.")
+    sources = [shard_path(shard, from_shards) for shard in range(from_shards)]
+    targets = [shard_path(shard) for shard in range(DB_SHARDS)]
+    missing = [p.name for p in sources if not p.exists()]
+    if missing:
+        raise click.ClickException(f"missing shard files: {', '.join(missing)}")
+    for path in sources:
+        stored = _stored_shard_count(path) or (1 if path == DB_PATH else None)
+        if stored not in (None, from_shards):
+            raise click.ClickException(f"{path.name} belongs to a {stored}-shard layout, not {from_shards}.")
+    in_the_way = [p.name for p in targets if p.exists() and p not in sources]
+    if in_the_way:
+        raise click.ClickException(f"refusing to overwrite {', '.join(in_the_way)}; move it aside first.")
+    for pool in _pools:
+        pool.clear()
+
+    staging = [Path(f"{p}.reshard") for p in targets]
+    out = []
+    for path in staging:
+        path.unlink(missing_ok=True)
+        conn = sqlite3.connect(str(path))
+        conn.row_factory = sqlite3.Row
+        for _, _, schema, _ in MIGRATIONS:
+            if schema is not None:
+                schema(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        out.append(conn)
+    try:
+        for path in sources:
+            src = sqlite3.connect(str(path))
+            try:
+                if _user_version(src) != SCHEMA_VERSION:
+                    raise click.ClickException(
+                        f"{path.name} is at schema v{_user_version(src)}; run "
+                        f"`SVM_DB_SHARDS={from_shards} flask --app app migrate` first.")
+                src.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                for table in ("voters", "votes"):
+                    columns = [r[1] for r in src.execute(f"PRAGMA table_info({table})") if r[1] != "id"]
+                    n = _reshard_copy(src, out, table, columns, chunk_size)
+                    click.echo(f"{path.name}: {n} {table} copied")
+            finally:
+                src.close()
+        for conn in out:
+            conn.execute("DELETE FROM tallies")
+            conn.execute("INSERT INTO tallies (candidate, count) SELECT candidate, COUNT(*) FROM votes GROUP BY candidate")
+            conn.commit()
+    except BaseException:
+        for conn, path in zip(out, staging):
+            conn.close()
+            path.unlink(missing_ok=True)
+        raise
+    for conn in out:
+        conn.close()
+
+    # Only swap files in once every row has been copied.
+    for path in sources:
+        os.replace(path, f"{path}.pre-reshard-{from_shards}")
+        for suffix in ("-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+    for path, final in zip(staging, targets):
+        os.replace(path, final)
+    click.echo(f"Resharded {from_shards} -> {DB_SHARDS}; old files kept as *.pre-reshard-{from_shards}.")
+    face_index.build(_iter_enrolled_faces())
+    click.echo(f"{face_index.path.name} rebuilt.")
+
+@APP.cli.command("inference-server")
+@click.option("--socket", "socket_path", default=lambda: INFERENCE_SOCKET or "/tmp/svm-inference.sock",
+              show_default="SVM_INFERENCE_SOCKET or /tmp/svm-inference.sock", help="Unix socket to listen on.")
+@click.option("--workers", default=INFERENCE_WORKERS, show_default=True, help="Inference processes.")
+@click.option("--max-batch", default=INFERENCE_MAX_BATCH, show_default=True, help="Frames per dispatch batch.")
+@click.option("--max-wait-ms", default=INFERENCE_MAX_WAIT_MS, show_default=True,
+              help="How long to wait for a batch to fill.")
+def inference_server_command(socket_path, workers, max_batch, max_wait_ms):
+    """Serves face detection for all web workers over a Unix socket."""
+    dispatcher = InferenceDispatcher(workers, max_batch, max_wait_ms)
+    with InferenceServer(socket_path, dispatcher) as server:
+        click.echo(f"Inference service on {socket_path} with {workers} worker(s).")
+        server.serve_forever()
+
+@APP.cli.command("reconcile-tallies")
+@click.option("--chunk-size", default=50000, show_default=True, help="Votes scanned per chunk.")
+@click.option("--fix", is_flag=True, help="Rewrite tallies from the recount when drift is found.")
+def reconcile_tallies_command(chunk_size, fix):
+    """Rebuilds vote tallies from the votes table and reports any drift."""
+    drifted = False
+    for shard in range(DB_SHARDS):
+        drift = reconcile_tallies(chunk_size=chunk_size, fix=fix, shard=shard)
+        prefix = f"[shard {shard}] " if DB_SHARDS > 1 else ""
+        for cand, (tally, recount) in sorted(drift.items()):
+            click.echo(f"{prefix}{cand}: tally={tally} recount={recount} drift={tally - recount:+d}")
+        drifted = drifted or bool(drift)
+    if not drifted:
+        click.echo("Tallies match the votes table.")
+    else:
+        click.echo("Tallies rebuilt." if fix else "Run with --fix to rebuild tallies.")
+
+# --- Streaming audit export ---
+EXPORT_TABLES = ("votes", "voters")
+BIOMETRIC_COLUMNS = {"face_data", "fingerprint"}
+EXPORT_CHUNK = 5000
+
+def export_columns(table, include_biometrics=False):
+    conn = get_conn()
+    try:
+        columns = [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+    finally:
+        conn.close()
+    return [c for c in columns if include_biometrics or c not in BIOMETRIC_COLUMNS]
+
+def iter_export(table, fmt, include_biometrics=False, chunk_size=EXPORT_CHUNK):
+    """
+    Yields a CSV or NDJSON dump of `table` as text chunks, one per `chunk_size`
+    rows. Each chunk is its own short keyset query on id, shard by shard, so
+    memory stays flat and no read snapshot is held open for the whole dump.
+    Every row leads with its shard number, since ids repeat across shards.
+    """
+    columns = export_columns(table, include_biometrics)
+    select = f"SELECT {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?"
+    header = ["shard"] + columns
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerow(header)
+        yield buf.getvalue()
+    for shard in range(DB_SHARDS):
+        last_id = 0
+        while True:
+            conn = get_conn(shard=shard)
+            try:
+                rows = conn.execute(select, (last_id, chunk_size)).fetchall()
+            finally:
+                conn.close()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            rows = [(shard,) + tuple(_export_value(v) for v in r) for r in rows]
+            if fmt == "csv":
+                buf = io.StringIO()
+                csv.writer(buf).writerows(rows)
+                yield buf.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(header, r))) + "\n" for r in rows)
+
+def _export_value(value):
+    # Face templates are BLOBs; dumps carry them base64-encoded.
+    return base64.b64encode(value).decode("ascii") if isinstance(value, bytes) else value
+
+def _gzipped(chunks):
+    """Gzip-compresses a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@APP.cli.command("export")
+@click.argument("table", type=click.Choice(EXPORT_TABLES))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True)
+@click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+@click.option("--biometrics", is_flag=True, help="Include face_data and fingerprint columns.")
+@click.option("--chunk-size", default=EXPORT_CHUNK, show_default=True, help="Rows fetched per query.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="Output file (default: stdout).")
+def export_command(table, fmt, compress, biometrics, chunk_size, output):
+    """Streams a full dump of the votes or voters table for audit."""
+    chunks = iter_export(table, fmt, include_biometrics=biometrics, chunk_size=chunk_size)
+    if compress:
+        chunks = _gzipped(chunks)
+    with click.open_file(output or "-", "wb") as out:
+        for chunk in chunks:
+            out.write(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+
+# --- Bulk voter roll import ---
+IMPORT_COLUMNS = ("voter_id", "name", "dob", "phone", "fingerprint")
+# Checkpoints (keyed by the roll's SHA-256) and uploads of web imports live here.
+IMPORT_DIR = Path(os.environ.get("SVM_IMPORT_DIR", BASE / "imports"))
+
+def _iter_roll(path):
+    """Yields voter dicts from a CSV (with header) or JSONL/NDJSON roll file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if Path(path).suffix.lower() in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def _enroll_photo(photo_path):
+    """Process-pool task: face template for one photo, or None."""
+    try:
+        img_bytes = Path(photo_path).read_bytes()
+    except OSError:
+        return None
+    return face_data_from_bytes(img_bytes)
+
+def roll_digest(path):
+    """SHA-256 of a roll file; checkpoints are keyed on it so an edited roll starts over."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _photo_path(photo_dir, name, photo_names=None):
+    """
+    Resolves a roll's `photo` value inside photo_dir, through photo_names
+    (original upload name -> stored name) when given. None if it escapes
+    photo_dir.
+    """
+    if photo_names is not None:
+        name = photo_names.get(name) or photo_names.get(Path(name).name) or name
+    path = (photo_dir / name).resolve()
+    return str(path) if path.is_relative_to(photo_dir.resolve()) else None
+
+def _load_checkpoint(path):
+    try:
+        return json.loads(Path(path).read_text())["rows_done"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+def _save_checkpoint(path, rows_done):
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(json.dumps({"rows_done": rows_done}))
+    os.replace(tmp, path)
+
+def import_roll(roll_path, photo_dir=None, batch_size=2000, processes=None,
+                checkpoint_path=None, progress=None, photo_names=None):
+    """
+    Streams a voter roll into the database in batches of `batch_size` rows.
+    Each row may name a `photo` file (relative to photo_dir, which it may not
+    escape; photo_names maps names used in the roll to stored file names);
+    photos of a batch are enrolled across a process pool, then the batch is
+    inserted with one executemany per shard and committed. After each batch
+    the number of input rows done is written to the checkpoint (default:
+    IMPORT_DIR/<roll sha256>.checkpoint), and a rerun skips that many rows;
+    inserts ignore voter_ids that already exist, so replaying the batch cut
+    short by a crash is harmless. The checkpoint is removed once the whole
+    roll is in. Returns a report with per-stage timings.
+    """
+    photo_dir = Path(photo_dir) if photo_dir else Path(roll_path).parent
+    if not checkpoint_path:
+        IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+        checkpoint_path = IMPORT_DIR / f"{roll_digest(roll_path)}.checkpoint"
+    skip = _load_checkpoint(checkpoint_path)
+    report = {"rows": 0, "imported": 0, "duplicates": 0, "no_face": 0, "invalid": 0,
+              "resumed_from": skip, "seconds": {"parse": 0.0, "enroll": 0.0, "insert": 0.0}}
+    rows_done = skip
+    seconds = report["seconds"]
+
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        rows = islice(_iter_roll(roll_path), skip, None)
+        while True:
+            start = time.perf_counter()
+            batch = list(islice(rows, batch_size))
+            seconds["parse"] += time.perf_counter() - start
+            if not batch:
+                break
+
+            start = time.perf_counter()
+            photos = [_photo_path(photo_dir, row["photo"], photo_names) if row.get("photo") else None
+                      for row in batch]
+            enrolled = iter(pool.map(_enroll_photo, [p for p in photos if p],
+                                     chunksize=max(1, len(batch) // (4 * (processes or os.cpu_count() or 1)))))
+            faces = [next(enrolled) if p else None for p in photos]
+            seconds["enroll"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            now = datetime.utcnow()
+            created_at, created_epoch = now.isoformat(), int(now.replace(tzinfo=timezone.utc).timestamp())
+            per_shard = {}
+            for row, photo, face_data in zip(batch, photos, faces):
+                if (not row.get("voter_id") or not row.get("name") or not row.get("dob")
+                        or (row.get("photo") and photo is None)):
+                    report["invalid"] += 1
+                    continue
+                if photo and face_data is None:
+                    report["no_face"] += 1
+                values = tuple(row.get(col) or None for col in IMPORT_COLUMNS)
+                per_shard.setdefault(shard_for(row["voter_id"]), []).append(
+                    values + (face_data, created_at, created_epoch))
+            for shard, values in per_shard.items():
+                conn = get_conn(shard=shard)
+                try:
+                    before = conn.total_changes
+                    conn.executemany("INSERT OR IGNORE INTO voters (voter_id, name, dob, phone, fingerprint, "
+                                     "face_data, created_at, created_epoch) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+                    conn.commit()
+                    inserted = conn.total_changes - before
+                    enrolled = _rowids_with_faces(conn, [v[0] for v in values if v[-3] is not None])
+                finally:
+                    conn.close()
+                face_index.add_many((FaceIndex.key(shard, rowid), decode_face_template(face))
+                                    for rowid, face in enrolled)
+                report["imported"] += inserted
+                report["duplicates"] += len(values) - inserted
+            seconds["insert"] += time.perf_counter() - start
+
+            rows_done += len(batch)
+            report["rows"] += len(batch)
+            _save_checkpoint(checkpoint_path, rows_done)
+            if progress:
+                progress(report)
+    Path(checkpoint_path).unlink(missing_ok=True)
+    return report
+
+def _write_job_status(job_dir, **status):
+    tmp = job_dir / "status.json.tmp"
+    tmp.write_text(json.dumps(status))
+    os.replace(tmp, job_dir / "status.json")
+
+def start_import_job(roll, photos, batch_size=2000):
+    """
+    Saves an uploaded roll and its photos under IMPORT_DIR/<roll sha256> and
+    runs import_roll on a background thread. Photos are stored under
+    generated names and matched through a map of their upload names. The
+    job's status.json is readable from every worker. Returns (job_id,
+    started); started is False while the same roll is still importing.
+    """
+    IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    fd, upload = tempfile.mkstemp(dir=IMPORT_DIR, prefix=".upload_")
+    with os.fdopen(fd, "wb") as f:
+        roll.save(f)
+    job_id = roll_digest(upload)
+    job_dir = IMPORT_DIR / job_id
+    job_dir.mkdir(exist_ok=True)
+    # Held by the import thread; the kernel drops it if the worker dies, so
+    # uploading the roll again resumes from its checkpoint.
+    lock = open(job_dir / "lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        os.unlink(upload)
+        return job_id, False
+
+    roll_path = job_dir / ("roll" + Path(secure_filename(roll.filename)).suffix.lower())
+    os.replace(upload, roll_path)
+    photo_dir = job_dir / "photos"
+    shutil.rmtree(photo_dir, ignore_errors=True)
+    photo_dir.mkdir()
+    photo_names = {}
+    for i, photo in enumerate(p for p in photos if p.filename):
+        stored = f"{i}{Path(secure_filename(photo.filename)).suffix.lower()}"
+        photo.save(photo_dir / stored)
+        photo_names[photo.filename] = stored
+    _write_job_status(job_dir, state="running", report=None)
+
+    def run():
+        try:
+            report = import_roll(roll_path, photo_dir, batch_size, checkpoint_path=IMPORT_DIR / f"{job_id}.checkpoint",
+                                 progress=lambda r: _write_job_status(job_dir, state="running", report=r),
+                                 photo_names=photo_names)
+            _write_job_status(job_dir, state="done", report=report)
+            logging.info("Bulk import %s finished: %s", job_id[:12], format_import_report(report))
+        except Exception as e:
+            logging.exception("Bulk import %s failed", job_id[:12])
+            _write_job_status(job_dir, state="failed", error=str(e))
+        finally:
+            roll_path.unlink(missing_ok=True)
+            shutil.rmtree(photo_dir, ignore_errors=True)
+            lock.close()
+
+    threading.Thread(target=run, name="svm-import", daemon=True).start()
+    return job_id, True
+
+def _rowids_with_faces(conn, voter_ids, chunk=500):
+    found = []
+    for i in range(0, len(voter_ids), chunk):
+        part = voter_ids[i:i + chunk]
+        found.extend((r["id"], r["face_data"]) for r in conn.execute(
+            f"SELECT id, face_data FROM voters WHERE voter_id IN ({','.join('?' * len(part))}) "
+            "AND face_data IS NOT NULL", part))
+    return found
+
+def format_import_report(report):
+    lines = [f"rows={report['rows']} imported={report['imported']} duplicates={report['duplicates']} "
+             f"no_face={report['no_face']} invalid={report['invalid']} resumed_from={report['resumed_from']}"]
+    for stage, secs in report["seconds"].items():
+        rate = report["rows"] / secs if secs else 0.0
+        lines.append(f"  {stage:>7}: {secs:8.2f}s  {rate:10.1f} rows/s")
+    return "\n".join(lines)
+
+@APP.cli.command("import-voters")
+@click.argument("roll", type=click.Path(exists=True, dir_okay=False))
+@click.option("--photos", type=click.Path(exists=True, file_okay=False),
+              help="Directory holding the photo files named in the roll (default: the roll's directory).")
+@click.option("--batch-size", default=2000, show_default=True, help="Rows per insert transaction.")
+@click.option("--processes", type=int, default=None, help="Face enrollment processes (default: CPU count).")
+@click.option("--checkpoint", type=click.Path(dir_okay=False),
+              help="Checkpoint file (default: SVM_IMPORT_DIR/<roll sha256>.checkpoint).")
+def import_voters_command(roll, photos, batch_size, processes, checkpoint):
+    """Bulk-imports a CSV/JSONL voter roll, enrolling faces from photo files."""
+    def progress(report):
+        click.echo(f"... {report['resumed_from'] + report['rows']} rows done", err=True)
+    report = import_roll(roll, photos, batch_size, processes, checkpoint, progress)
+    click.echo(format_import_report(report))
+
 
 if __name__ == "__main__":
     APP.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Cast-vote latency while face inference is saturated, with inference
+admission control on and off, against a local gunicorn.
+
+    python bench/bench_admission.py --face-clients 12 --seconds 10
+
+Face clients hammer /api/verify_face with large frames while one client
+casts votes at a steady rate; an idle run gives the unloaded baseline. The
+inference queue depth, in-flight count and shed total, summed over all
+workers, are scraped from /metrics at the end of each run.
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from common import LocalServer, load_app, percentile, seed_voters, synthetic_face_jpeg
+
+GAUGES = ("svm_inference_queue_depth", "svm_inference_in_flight", "svm_inference_shed_total")
+
+
+def post(url, data, content_type):
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as res:
+            res.read()
+            return res.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def scrape_admission(url):
+    """The admission gauges and shed counter from a /metrics scrape."""
+    values = {}
+    with urllib.request.urlopen(f"{url}/metrics", timeout=30) as res:
+        for line in res.read().decode().splitlines():
+            name, _, value = line.partition(" ")
+            if name in GAUGES:
+                values[name] = float(value)
+    return values
+
+
+def run(args, admission, face_clients):
+    db_path = Path(tempfile.mkdtemp(prefix="svm_bench_")) / "bench.db"
+    app = load_app(db_path)
+    voter_ids = seed_voters(app, 5000)
+    face = synthetic_face_jpeg(1, size=(1280, 720))
+    conn = app.get_conn()
+    conn.execute("UPDATE voters SET face_data = ? WHERE voter_id = ?",
+                 (app.detect_face_template(face), voter_ids[0]))
+    conn.commit()
+    conn.close()
+
+    env = {} if admission else {"inference_concurrency": 0}
+    with LocalServer(db_path, port=args.port, workers=args.workers, **env) as server:
+        stop = threading.Event()
+        face_status = {}
+        lock = threading.Lock()
+
+        def face_client():
+            url = f"{server.url}/api/verify_face?voter_id={voter_ids[0]}"
+            while not stop.is_set():
+                status = post(url, face, "image/jpeg")
+                with lock:
+                    face_status[status] = face_status.get(status, 0) + 1
+
+        threads = [threading.Thread(target=face_client, daemon=True) for _ in range(face_clients)]
+        for t in threads:
+            t.start()
+        time.sleep(1)  # let the inference queue fill up
+
+        cast_latencies, cast_errors = [], 0
+        deadline = time.monotonic() + args.seconds
+        for voter_id in voter_ids[1:]:
+            if time.monotonic() > deadline:
+                break
+            start = time.perf_counter()
+            status = post(f"{server.url}/api/cast_vote",
+                          json.dumps({"voter_id": voter_id, "candidate": "A"}).encode(), "application/json")
+            cast_latencies.append(time.perf_counter() - start)
+            cast_errors += status != 200
+            time.sleep(1 / args.cast_rate)
+
+        admission = scrape_admission(server.url)
+        stop.set()
+        for t in threads:
+            t.join(timeout=30)
+    return cast_latencies, cast_errors, face_status, admission
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--face-clients", type=int, default=12)
+    parser.add_argument("--cast-rate", type=float, default=20, help="Votes per second.")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8792)
+    args = parser.parse_args()
+
+    for label, admission, face_clients in (("idle (no face load)", True, 0), ("admission off", False, args.face_clients),
+                                           ("admission on", True, args.face_clients)):
+        latencies, errors, face_status, gauges = run(args, admission, face_clients)
+        print(f"{label}:")
+        print(f"  cast_vote  n={len(latencies)} errors={errors} p50 {percentile(latencies, 50) * 1000:.1f} ms "
+              f"p99 {percentile(latencies, 99) * 1000:.1f} ms max {max(latencies) * 1000:.1f} ms")
+        print(f"  verify_face statuses {dict(sorted(face_status.items()))}")
+        print("  " + ", ".join(f"{name.removeprefix('svm_inference_')}={value:g}" for name, value in gauges.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Requests/sec of the voter lookup endpoints with and without the connection pool.
+
+    python bench/bench_db_pool.py --voters 20000 --requests 5000 --threads 4
+"""
+import argparse
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Timer, load_app, seed_voters
+
+
+def legacy_database(app):
+    """
+    A copy of the seeded database in the default rollback journal mode: the
+    pooled database is already in WAL mode, which sticks to the file, so the
+    baseline needs its own file to measure the pre-pool setup.
+    """
+    path = app.DB_PATH.with_name("legacy.db")
+    src, dst = sqlite3.connect(str(app.DB_PATH)), sqlite3.connect(str(path))
+    src.backup(dst)
+    dst.execute("PRAGMA journal_mode=DELETE")
+    src.close()
+    dst.close()
+    return path
+
+
+def legacy_get_conn(path):
+    """The pre-pool get_conn(): a plain connection, default journal, per call."""
+    def get_conn(voter_id=None, shard=None):
+        conn = sqlite3.connect(str(path))
+        conn.row_factory = sqlite3.Row
+        return conn
+    return get_conn
+
+
+def run(app, voter_ids, requests, threads):
+    client = app.APP.test_client()
+
+    def one(i):
+        voter_id = random.choice(voter_ids)
+        client.post("/api/verify_qr", json={"voter_id": voter_id})
+        client.post("/api/verify_fingerprint",
+                    json={"voter_id": voter_id, "fp_payload": "fp" + voter_id[-7:].lstrip("0")})
+
+    with Timer() as t, ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(requests)))
+    return 2 * requests / t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--voters", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    app = load_app(voter_cache_size=0)  # every lookup goes to SQLite
+    voter_ids = seed_voters(app, args.voters)
+    pooled_get_conn = app.get_conn
+    app.get_conn = legacy_get_conn(legacy_database(app))
+    before = run(app, voter_ids, args.requests, args.threads)
+    app.get_conn = pooled_get_conn
+    after = run(app, voter_ids, args.requests, args.threads)
+    print(f"connect per request (rollback journal): {before:10.1f} req/s")
+    print(f"pooled (WAL)                          : {after:10.1f} req/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
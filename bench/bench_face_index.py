@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+1:N nearest-face search: vectorized memory-mapped FaceIndex vs a per-row
+compare_faces loop, at several roll sizes.
+
+    python bench/bench_face_index.py --sizes 10000 100000 1000000
+"""
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import Timer, load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--loop-sample", type=int, default=5000,
+                        help="Rows timed with the per-row loop; its cost is extrapolated to each size.")
+    args = parser.parse_args()
+
+    app = load_app()
+    logging.disable(logging.INFO)  # compare_faces logs every distance
+    rng = np.random.default_rng(0)
+    blobs = [app.encode_face_template(t) for t in rng.random((args.loop_sample, app.FACE_KEYPOINTS, 2))]
+    live = app.encode_face_template(rng.random((app.FACE_KEYPOINTS, 2)))
+    with Timer() as t:
+        for blob in blobs:
+            app.compare_faces(blob, live)
+    per_row = t.elapsed / len(blobs)
+
+    print(f"{'templates':>10} {'file MiB':>9} {'build s':>8} {'index ms':>9} {'loop ms (est)':>14}")
+    for size in args.sizes:
+        index = app.FaceIndex(Path(tempfile.mkdtemp(prefix="svm_faces_")) / "bench.faces")
+        templates = rng.random((size, app.FACE_KEYPOINTS, 2), dtype=np.float32)
+        with Timer() as build:
+            index.build(((i, templates[i]) for i in range(size)), capacity_hint=size)
+        queries = rng.random((args.queries, app.FACE_KEYPOINTS, 2), dtype=np.float32)
+        index.nearest(queries[0])  # map the file
+        start = time.perf_counter()
+        for q in queries:
+            index.nearest(q)
+        search = (time.perf_counter() - start) / len(queries)
+        mib = index.path.stat().st_size / 2**20
+        print(f"{size:10d} {mib:9.1f} {build.elapsed:8.2f} {search * 1000:9.2f} {per_row * size * 1000:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Per-frame latency and detection rate of get_face_data's preprocessing and
+detector settings over a local image corpus (synthetic faces by default).
+
+    python bench/bench_face_preprocess.py --images ~/booth_frames
+"""
+import argparse
+import itertools
+import logging
+import time
+
+from common import load_app, load_image_corpus, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="Directory of JPEG/PNG frames (default: synthetic faces).")
+    parser.add_argument("--count", type=int, default=40, help="Synthetic frames when --images is not given.")
+    parser.add_argument("--models", type=int, nargs="+", default=[0, 1], help="0 = short range, 1 = full range.")
+    parser.add_argument("--reductions", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--short-sides", type=int, nargs="+", default=[0, 480, 320], help="0 = no resize.")
+    args = parser.parse_args()
+
+    app = load_app()
+    logging.disable(logging.ERROR)  # undetectable frames are expected at low resolution
+    corpus = load_image_corpus(args.images, args.count)
+    print(f"{len(corpus)} frames")
+    print(f"{'model':>6} {'reduce':>6} {'short':>6} {'p50 ms':>8} {'p95 ms':>8} {'detected':>9}")
+    for model, reduction, short_side in itertools.product(args.models, args.reductions, args.short_sides):
+        app.FACE_DETECTOR_MODEL = model
+        app.FACE_DECODE_REDUCTION = reduction
+        app.FACE_TARGET_SHORT_SIDE = short_side
+        app._face_detection = None
+        app.detect_face_template(corpus[0])  # build the detector outside the timings
+        latencies, detected = [], 0
+        for frame in corpus:
+            start = time.perf_counter()
+            detected += app.detect_face_template(frame) is not None
+            latencies.append(time.perf_counter() - start)
+        print(f"{('short', 'full')[model]:>6} {reduction:>6} {short_side or '-':>6} "
+              f"{percentile(latencies, 50) * 1000:8.2f} {percentile(latencies, 95) * 1000:8.2f} "
+              f"{detected / len(corpus):9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Time-to-verify of the streaming face endpoint against a local gunicorn.
+
+    python bench/bench_face_stream.py --client-fps 15 --misses 3
+
+Frames are sent over one chunked HTTP request at --client-fps; the first
+--misses frames contain no face, so the numbers include the governor's
+skipping and the per-frame detection cost before the match.
+"""
+import argparse
+import http.client
+import select
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import LocalServer, load_app, percentile, synthetic_face_jpeg
+
+
+def stream_once(port, voter_id, frames, fps):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.putrequest("POST", f"/api/verify_face/stream?voter_id={voter_id}")
+    conn.putheader("Content-Type", "application/octet-stream")
+    conn.putheader("Transfer-Encoding", "chunked")
+    conn.endheaders()
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        if i:
+            time.sleep(1 / fps)
+        if select.select([conn.sock], [], [], 0)[0]:
+            break  # the server has answered; stop streaming like the booth page does
+        chunk = len(frame).to_bytes(4, "big") + frame
+        try:
+            conn.send(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        except OSError:
+            break
+    try:
+        conn.send(b"0\r\n\r\n")
+    except OSError:
+        pass
+    res = conn.getresponse()
+    body = res.read()
+    conn.close()
+    return time.perf_counter() - start, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--client-fps", type=float, default=15)
+    parser.add_argument("--misses", type=int, default=3, help="Faceless frames sent before the face.")
+    parser.add_argument("--port", type=int, default=8791)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(prefix="svm_bench_")) / "bench.db"
+    app = load_app(db_path)
+    face = synthetic_face_jpeg(1, size=(320, 240))
+    conn = app.get_conn()
+    conn.execute("INSERT INTO voters (voter_id, name, dob, face_data) VALUES ('STREAM1', 'n', '1990-01-01', ?)",
+                 (app.detect_face_template(face),))
+    conn.commit()
+    conn.close()
+    blank = app.vision()[0].imencode(".jpg", np.zeros((240, 320, 3), np.uint8))[1].tobytes()
+    frames = [blank] * args.misses + [face] * 20
+
+    with LocalServer(db_path, port=args.port, workers=1):
+        latencies = []
+        for _ in range(args.runs):
+            elapsed, body = stream_once(args.port, "STREAM1", frames, args.client_fps)
+            latencies.append(elapsed)
+        print(f"last response: {body.decode()[:300]}")
+        print(f"time to verify: p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+              f"p95 {percentile(latencies, 95) * 1000:.1f} ms over {args.runs} streams")
+
+
+if __name__ == "__main__":
+    main()
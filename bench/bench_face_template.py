@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Decode+compare time and stored size: legacy base64 pickled float64 landmarks
+vs the binary float32 face template BLOB.
+
+    python bench/bench_face_template.py --iterations 100000
+"""
+import argparse
+import base64
+import pickle
+import timeit
+
+import numpy as np
+
+from common import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    app = load_app()
+    rng = np.random.default_rng(0)
+    known, live = rng.random((2, app.FACE_KEYPOINTS, 2))
+
+    legacy_stored = base64.b64encode(pickle.dumps(known)).decode("utf-8")
+    legacy_live = pickle.dumps(live)
+    template_stored = app.encode_face_template(known)
+    template_live = app.encode_face_template(live)
+
+    def legacy():
+        known_landmarks = pickle.loads(base64.b64decode(legacy_stored))
+        return np.linalg.norm(pickle.loads(legacy_live) - known_landmarks) < 0.4
+
+    def template():
+        known_landmarks = app.decode_face_template(template_stored)
+        return np.linalg.norm(app.decode_face_template(template_live) - known_landmarks) < 0.4
+
+    print(f"{'format':>16} {'row bytes':>10} {'decode+compare us':>18}")
+    for label, size, fn in (("pickle+base64", len(legacy_stored), legacy),
+                            ("float32 template", len(template_stored), template)):
+        seconds = min(timeit.repeat(fn, number=args.iterations, repeat=3)) / args.iterations
+        print(f"{label:>16} {size:10d} {seconds * 1e6:18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Votes/sec and latency of /api/cast_vote: per-request commit vs group commit.
+Both paths run with synchronous=FULL so every acknowledged vote is fsynced.
+Group commit only batches requests that are in flight together, i.e. it
+needs a threaded worker (gunicorn --threads N); --threads models that here.
+
+    python bench/bench_group_commit.py --votes 4000 --threads 32
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Timer, load_app, percentile, seed_voters
+
+
+def run(app, voter_ids, threads):
+    client = app.APP.test_client()
+
+    def cast(voter_id):
+        start = time.perf_counter()
+        res = client.post("/api/cast_vote", json={"voter_id": voter_id, "candidate": "A"})
+        assert res.status_code == 200, res.get_json()
+        return time.perf_counter() - start
+
+    with Timer() as t, ThreadPoolExecutor(threads) as pool:
+        latencies = list(pool.map(cast, voter_ids))
+    return len(voter_ids) / t.elapsed, percentile(latencies, 50), percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--votes", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    app = load_app(db_synchronous="FULL")
+    voter_ids = seed_voters(app, 2 * args.votes)
+    print(f"{'mode':>20} {'votes/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, group_commit, ids in (("per-request commit", False, voter_ids[:args.votes]),
+                                     ("group commit", True, voter_ids[args.votes:])):
+        app.GROUP_COMMIT = group_commit
+        rate, p50, p99 = run(app, ids, args.threads)
+        print(f"{label:>20} {rate:10.1f} {p50 * 1000:8.2f} {p99 * 1000:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Vote write throughput as the number of database shards grows. Each writer
+process casts votes for its own slice of the roll through record_vote()
+with synchronous=FULL, so the single SQLite writer lock is the bottleneck.
+
+    python bench/bench_shards.py --shards 1 2 4 --writers 4 --votes 2000
+"""
+import argparse
+import multiprocessing as mp
+import tempfile
+import time
+from pathlib import Path
+
+from common import load_app, seed_voters
+
+
+def writer(db_path, shards, voter_ids, barrier):
+    app = load_app(db_path, db_shards=shards, db_synchronous="FULL")
+    barrier.wait()
+    for voter_id in voter_ids:
+        conn = app.get_conn(voter_id)
+        try:
+            while True:
+                try:
+                    app.record_vote(conn, voter_id, "A")
+                    break
+                except app.sqlite3.OperationalError:  # busy beyond busy_timeout
+                    time.sleep(0.001)
+        finally:
+            conn.close()
+
+
+def run(shards, writers, votes):
+    db_path = Path(tempfile.mkdtemp(prefix="svm_shards_")) / "bench.db"
+    app = load_app(db_path, db_shards=shards, db_synchronous="FULL")
+    voter_ids = seed_voters(app, votes)
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(writers + 1)
+    procs = [ctx.Process(target=writer, args=(db_path, shards, voter_ids[i::writers], barrier))
+             for i in range(writers)]
+    for p in procs:
+        p.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for p in procs:
+        p.join()
+    return votes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--votes", type=int, default=2000)
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in args.shards:
+        rate = run(shards, args.writers, args.votes)
+        baseline = baseline or rate
+        print(f"shards={shards:<3} {rate:10.1f} votes/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
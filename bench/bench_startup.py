@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Worker startup cost: time to import app.py, and latency of the first and
+second face verification in a fresh process, with and without warm-up.
+
+    python bench/bench_startup.py --runs 5
+
+Each run is a separate interpreter, so nothing is shared between samples.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from common import percentile
+
+CHILD = r"""
+import io, json, sys, time
+sys.path.insert(0, {bench!r})
+start = time.perf_counter()
+from common import load_app
+app = load_app(auto_migrate=0, profile={profile!r})
+import_s = time.perf_counter() - start
+vision_loaded = "cv2" in sys.modules or "mediapipe" in sys.modules
+app.init_db()
+warm_s = None
+if {warm!r} and hasattr(app, "warm_up"):
+    start = time.perf_counter()
+    app.warm_up()
+    warm_s = time.perf_counter() - start
+from common import synthetic_face_jpeg
+frame = synthetic_face_jpeg(1)
+template = app.detect_face_template(frame) if {warm!r} else None
+conn = app.get_conn()
+conn.execute("INSERT INTO voters (voter_id, name, dob, face_data) VALUES ('V1', 'n', '1990-01-01', ?)",
+             (template or app.encode_face_template([(0.5, 0.5)] * 6),))
+conn.commit(); conn.close()
+client = app.APP.test_client()
+requests = []
+for _ in range(2):
+    start = time.perf_counter()
+    client.post("/api/verify_face?voter_id=V1", data=frame, content_type="image/jpeg")
+    requests.append(time.perf_counter() - start)
+print(json.dumps(dict(import_s=import_s, vision_loaded=vision_loaded, warm_s=warm_s,
+                      first_s=requests[0], second_s=requests[1])))
+"""
+
+
+def run_child(profile, warm):
+    code = CHILD.format(bench=str(Path(__file__).resolve().parent), profile=profile, warm=warm)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env=dict(os.environ, GLOG_minloglevel="2"))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'scenario':>12} {'import ms':>10} {'vision':>7} {'warm-up ms':>11} "
+          f"{'1st req ms':>11} {'2nd req ms':>11}")
+    for label, profile, warm in (("booth cold", "booth", False), ("booth warm", "booth", True),
+                                 ("admin", "admin", False)):
+        samples = [run_child(profile, warm) for _ in range(args.runs)]
+        med = lambda key: percentile([s[key] for s in samples], 50) * 1000
+        warm_ms = f"{med('warm_s'):11.1f}" if samples[0]["warm_s"] is not None else f"{'-':>11}"
+        print(f"{label:>12} {med('import_s'):10.1f} {str(samples[0]['vision_loaded']):>7} {warm_ms} "
+              f"{med('first_s'):11.1f} {med('second_s'):11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Contention check for the vote casting path: several processes (standing in
+for gunicorn workers) each run several threads that all try to cast a vote
+for every voter at the same time. Exits non-zero unless every voter ends up
+with exactly one vote and exactly one successful cast was reported.
+
+    python bench/check_cast_contention.py --voters 200 --workers 4 --threads 4
+"""
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common import count_votes_per_voter, load_app, seed_voters
+
+
+def worker(db_path, voter_ids, threads, barrier, results):
+    app = load_app(db_path)
+    client = app.APP.test_client()
+
+    def cast(voter_id):
+        res = client.post("/api/cast_vote", json={"voter_id": voter_id, "candidate": "A"})
+        return res.status_code
+
+    barrier.wait()
+    with ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(cast, voter_ids * threads))
+    results.put(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vote casting contention check")
+    parser.add_argument("--voters", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(prefix="svm_contention_")) / "contention.db"
+    app = load_app(db_path)
+    voter_ids = seed_voters(app, args.voters)
+
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(db_path, voter_ids, args.threads, barrier, results))
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    codes = [code for _ in procs for code in results.get()]
+    for p in procs:
+        p.join()
+
+    per_voter = count_votes_per_voter(app)
+    successes = codes.count(200)
+    errors = len(codes) - successes - codes.count(403)
+    doubled = [voter_id for voter_id, n in per_voter.items() if n != 1]
+    print(f"attempts={len(codes)} successes={successes} already_voted={codes.count(403)} errors={errors}")
+    print(f"voters with votes={len(per_voter)} double-counted={len(doubled)}")
+    if successes != args.voters or len(per_voter) != args.voters or doubled or errors:
+        print("FAIL: expected exactly one vote per voter")
+        sys.exit(1)
+    print("OK: exactly one vote per voter")
+
+
+if __name__ == "__main__":
+    main()
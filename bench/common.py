@@ -0,0 +1,174 @@
+"""Shared helpers for the offline benchmark scripts in this directory."""
+import importlib
+import random
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_app(db_path=None, **env):
+    """
+    Imports app.py against a throwaway database.
+    SVM_* settings are read at import time, so they are set in the
+    environment first; `env` keys are given without the SVM_ prefix.
+    """
+    if db_path is None:
+        db_path = Path(tempfile.mkdtemp(prefix="svm_bench_")) / "bench.db"
+    os.environ["SVM_DB_PATH"] = str(db_path)
+    for key, value in env.items():
+        os.environ[f"SVM_{key.upper()}"] = str(value)
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    if "app" in sys.modules:
+        _unregister_metrics(sys.modules["app"])
+        return importlib.reload(sys.modules["app"])
+    return importlib.import_module("app")
+
+
+def _unregister_metrics(module):
+    """Drops a module's Prometheus metrics so a reload can register them again."""
+    from prometheus_client import REGISTRY
+    from prometheus_client.metrics import MetricWrapperBase
+    for value in vars(module).values():
+        if isinstance(value, MetricWrapperBase):
+            REGISTRY.unregister(value)
+
+
+def seed_voters(app, count, prefix="BENCH"):
+    """Inserts `count` adult voters with a known fingerprint payload, routed by shard."""
+    now = datetime.utcnow().isoformat()
+    voter_ids = [f"{prefix}{i:07d}" for i in range(count)]
+    for shard in range(app.DB_SHARDS):
+        conn = app.get_conn(shard=shard)
+        conn.executemany(
+            "INSERT OR IGNORE INTO voters (voter_id, name, dob, phone, fingerprint, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((voter_id, f"Voter {i}", "1990-01-01", "0000000000", f"fp{i}", now)
+             for i, voter_id in enumerate(voter_ids) if app.shard_for(voter_id) == shard))
+        conn.commit()
+        conn.close()
+    return voter_ids
+
+
+def count_votes_per_voter(app):
+    """{voter_id: number of votes} across all shards."""
+    counts = {}
+    for shard in range(app.DB_SHARDS):
+        conn = app.get_conn(shard=shard)
+        for r in conn.execute("SELECT voter_id, COUNT(*) AS n FROM votes GROUP BY voter_id"):
+            counts[r["voter_id"]] = counts.get(r["voter_id"], 0) + r["n"]
+        conn.close()
+    return counts
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Timer:
+    """Context manager recording wall time in seconds on `.elapsed`."""
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def synthetic_face_jpeg(seed, scale=1.0, size=(640, 480), quality=90):
+    """
+    A drawn face (skin ellipse, hair, eyes, brows, nose, mouth) on a noisy
+    background that MediaPipe detects reliably. Lets the benchmarks run
+    offline without shipping a photo corpus; `seed` jitters placement.
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    w, h = size
+    s = scale * min(w, h) / 480
+    cx = int(w / 2 + rng.integers(-w // 10, w // 10 + 1))
+    cy = int(h / 2 + rng.integers(-h // 12, h // 12 + 1))
+    img = np.full((h, w, 3), (90, 110, 130), np.uint8)
+    img = cv2.add(img, rng.integers(0, 20, (h, w, 3), dtype=np.uint8))
+    cv2.ellipse(img, (cx, cy), (int(90 * s), int(120 * s)), 0, 0, 360, (140, 170, 215), -1)
+    cv2.ellipse(img, (cx, cy - int(100 * s)), (int(95 * s), int(50 * s)), 0, 180, 360, (30, 30, 40), -1)
+    for dx in (-35, 35):
+        eye = (cx + int(dx * s), cy - int(20 * s))
+        cv2.ellipse(img, eye, (int(18 * s), int(9 * s)), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(img, eye, int(7 * s), (40, 30, 20), -1)
+        cv2.line(img, (cx + int((dx - 20) * s), cy - int(42 * s)), (cx + int((dx + 20) * s), cy - int(45 * s)),
+                 (40, 40, 60), max(1, int(5 * s)))
+    cv2.line(img, (cx, cy - int(10 * s)), (cx - int(8 * s), cy + int(25 * s)), (110, 130, 180), 3)
+    cv2.ellipse(img, (cx, cy + int(55 * s)), (int(30 * s), int(10 * s)), 0, 0, 180, (60, 60, 170), -1)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def load_image_corpus(directory=None, count=40, size=(1280, 720)):
+    """
+    Encoded images for face benchmarks: every JPEG/PNG in `directory` when
+    given, otherwise `count` synthetic faces at varied scales.
+    """
+    if directory:
+        paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        return [p.read_bytes() for p in paths]
+    rnd = random.Random(0)
+    return [synthetic_face_jpeg(i, scale=rnd.uniform(0.6, 1.4), size=size) for i in range(count)]
+
+
+class LocalServer:
+    """
+    Context manager running `gunicorn app:APP` from the repo root (so
+    gunicorn.conf.py applies) on a local port until /readyz answers 200.
+    `env` keys are given without the SVM_ prefix, as for load_app().
+    """
+    def __init__(self, db_path, port=8790, workers=2, **env):
+        self.db_path = db_path
+        self.port = port
+        self.workers = workers
+        self.env = {f"SVM_{key.upper()}": str(value) for key, value in env.items()}
+        self.url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        env = dict(os.environ, SVM_DB_PATH=str(self.db_path), SVM_AUTO_MIGRATE="0", **self.env)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "app:APP", "--bind", f"127.0.0.1:{self.port}",
+             "--workers", str(self.workers)], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(f"{self.url}/readyz") as res:
+                    if res.status == 200:
+                        return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.process.terminate()
+        raise RuntimeError("server did not become ready")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+
+def admin_opener(url):
+    """A urllib opener logged in to the admin UI (session cookie kept)."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor())
+    form = urllib.parse.urlencode({"username": "poomalai005", "password": "Poomalai2005@"}).encode()
+    opener.open(f"{url}/admin/login", data=form).read()
+    return opener
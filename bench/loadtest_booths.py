@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test: N simulated polling booths walk voters through
+verify_qr -> verify_fingerprint -> verify_face -> cast_vote against a local
+gunicorn serving app:APP on a throwaway database.
+
+    python bench/loadtest_booths.py --booths 8 --voters 400 --workers 2
+    python bench/loadtest_booths.py --images ~/test_faces   # real photos
+
+Voters get face templates enrolled from the test images (synthetic faces
+unless --images is given), and each booth submits the voter's own image as
+the live frame. A booth retries a 503 after its Retry-After, like the booth
+page would. At the end the votes in the database must equal the number of
+successful casts, with no voter counted twice.
+"""
+import argparse
+import http.client
+import json
+import queue
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from common import LocalServer, Timer, count_votes_per_voter, load_app, load_image_corpus, percentile, seed_voters
+
+ENDPOINTS = ("/api/verify_qr", "/api/verify_fingerprint", "/api/verify_face", "/api/cast_vote")
+
+
+def seed(app, count, images):
+    """Seeds `count` voters and enrolls voter i with the template of image i % len(images)."""
+    voter_ids = seed_voters(app, count, prefix="BOOTH")
+    templates = [app.detect_face_template(img) for img in images]
+    usable = [i for i, t in enumerate(templates) if t is not None]
+    if not usable:
+        raise SystemExit("no face detected in any test image")
+    assignment = {}
+    for shard in range(app.DB_SHARDS):
+        conn = app.get_conn(shard=shard)
+        rows = []
+        for i, voter_id in enumerate(voter_ids):
+            if app.shard_for(voter_id) == shard:
+                image = usable[i % len(usable)]
+                assignment[voter_id] = image
+                rows.append((templates[image], voter_id))
+        conn.executemany("UPDATE voters SET face_data = ? WHERE voter_id = ?", rows)
+        conn.commit()
+        conn.close()
+    return [(voter_id, f"fp{i}", assignment[voter_id]) for i, voter_id in enumerate(voter_ids)]
+
+
+class Booth(threading.Thread):
+    """One kiosk: a keep-alive connection, voters taken from a shared queue."""
+    def __init__(self, port, voters, images, results, think):
+        super().__init__(daemon=True)
+        self.port = port
+        self.voters = voters
+        self.images = images
+        self.results = results
+        self.think = think
+        self.conn = None
+
+    def request(self, path, body, content_type):
+        while True:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            start = time.perf_counter()
+            try:
+                self.conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+                res = self.conn.getresponse()
+                payload = res.read()
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                self.results.append((path.split("?")[0], "conn_error", time.perf_counter() - start))
+                return None
+            endpoint = path.split("?")[0]
+            self.results.append((endpoint, res.status, time.perf_counter() - start))
+            if res.status == 503:
+                time.sleep(float(res.getheader("Retry-After", "1")))
+                continue
+            return json.loads(payload) if payload else None
+
+    def run(self):
+        while True:
+            try:
+                voter_id, fingerprint, image = self.voters.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            steps = (
+                ("/api/verify_qr", json.dumps({"voter_id": voter_id}).encode(), "application/json"),
+                ("/api/verify_fingerprint", json.dumps({"voter_id": voter_id, "fp_payload": fingerprint}).encode(),
+                 "application/json"),
+                (f"/api/verify_face?voter_id={voter_id}", self.images[image], "image/jpeg"),
+                ("/api/cast_vote", json.dumps({"voter_id": voter_id, "candidate": "Candidate A"}).encode(),
+                 "application/json"),
+            )
+            for path, body, content_type in steps:
+                reply = self.request(path, body, content_type)
+                if not reply or not reply.get("ok"):
+                    self.results.append(("voter", "failed", time.perf_counter() - start))
+                    break
+                time.sleep(self.think)
+            else:
+                self.results.append(("voter", "voted", time.perf_counter() - start))
+
+
+def report(results, elapsed):
+    print(f"{'endpoint':>24} {'n':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for endpoint in ENDPOINTS + ("voter",):
+        rows = [(status, secs) for name, status, secs in results if name == endpoint]
+        latencies = [secs for _, secs in rows]
+        statuses = {}
+        for status, _ in rows:
+            statuses[status] = statuses.get(status, 0) + 1
+        label = "voter (end to end)" if endpoint == "voter" else endpoint
+        print(f"{label:>24} {len(rows):6d} {len(rows) / elapsed:8.1f} {percentile(latencies, 50) * 1000:8.1f} "
+              f"{percentile(latencies, 95) * 1000:8.1f} {percentile(latencies, 99) * 1000:8.1f}  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--booths", type=int, default=8)
+    parser.add_argument("--voters", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker.")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--images", help="Directory of face photos (default: synthetic faces).")
+    parser.add_argument("--face-size", default="640x480", help="Synthetic frame size, WxH.")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause between a booth's steps.")
+    parser.add_argument("--port", type=int, default=8793)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(prefix="svm_loadtest_")) / "loadtest.db"
+    app = load_app(db_path, db_shards=args.shards)
+    images = load_image_corpus(args.images, 16, tuple(int(v) for v in args.face_size.split("x")))
+    with Timer() as t:
+        voters = seed(app, args.voters, images)
+    print(f"seeded {len(voters)} voters with {len(images)} face images in {t.elapsed:.1f}s")
+
+    pending = queue.Queue()
+    for voter in voters:
+        pending.put(voter)
+    results = []
+    with LocalServer(db_path, port=args.port, workers=args.workers, db_shards=args.shards,
+                     gunicorn_threads=args.threads):
+        booths = [Booth(args.port, pending, images, results, args.think_ms / 1000) for _ in range(args.booths)]
+        with Timer() as t:
+            for booth in booths:
+                booth.start()
+            for booth in booths:
+                booth.join()
+    print(f"{args.booths} booths, {args.workers} workers x {args.threads} threads, {t.elapsed:.1f}s")
+    report(results, t.elapsed)
+
+    casts = sum(1 for name, status, _ in results if name == "/api/cast_vote" and status == 200)
+    votes = count_votes_per_voter(app)
+    total = sum(votes.values())
+    doubles = sum(1 for n in votes.values() if n > 1)
+    print(f"successful casts {casts}, votes in database {total}, voters counted twice {doubles}")
+    if total != casts or doubles:
+        raise SystemExit("MISMATCH between successful casts and stored votes")
+    print("vote count check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the face, database and page rendering hot paths, with
+JSON results and a regression gate.
+
+    python bench/microbench.py run --voters 20000 --out base.json
+    python bench/microbench.py run --out new.json --baseline base.json --threshold 0.15
+    python bench/microbench.py compare base.json new.json --threshold 0.15
+
+Everything runs offline: images come from --images or are synthetic, and
+the database is generated with --voters rows. `compare` (and `run` with
+--baseline) exits with status 1 when a metric's median got slower than
+the baseline by more than --threshold (a fraction).
+"""
+import argparse
+import base64
+import itertools
+import json
+import logging
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from common import ROOT, load_app, load_image_corpus, percentile, seed_voters
+
+BENCHMARKS = {}
+
+
+def bench(name):
+    """Registers a benchmark: a function of the context returning the callable to time."""
+    def register(f):
+        BENCHMARKS[name] = f
+        return f
+    return register
+
+
+# --- Face pipeline ---
+@bench("face.decode")
+def _(ctx):
+    frames = itertools.cycle(ctx["images"])
+    return lambda: ctx["app"].prepare_frame(next(frames))
+
+
+@bench("face.detect")
+def _(ctx):
+    frames = itertools.cycle(ctx["images"])
+    return lambda: ctx["app"].detect_face_template(next(frames))
+
+
+@bench("face.get_face_data")
+def _(ctx):
+    encoded = itertools.cycle([base64.b64encode(img).decode() for img in ctx["images"]])
+    return lambda: ctx["app"].get_face_data(next(encoded))
+
+
+@bench("face.template_encode")
+def _(ctx):
+    points = [(random.random(), random.random()) for _ in range(6)]
+    return lambda: ctx["app"].encode_face_template(points)
+
+
+@bench("face.template_decode")
+def _(ctx):
+    blob = ctx["templates"][0]
+    return lambda: ctx["app"].decode_face_template(blob)
+
+
+@bench("face.compare")
+def _(ctx):
+    known, live = ctx["templates"][0], ctx["templates"][-1]
+    return lambda: ctx["app"].compare_faces(known, live)
+
+
+# --- Voter records and votes ---
+@bench("voter.calculate_age")
+def _(ctx):
+    return lambda: ctx["app"].calculate_age("1990-06-15")
+
+
+@bench("voter.lookup_db")
+def _(ctx):
+    # The cache's own miss path: shard routing, pooled connection, the narrow
+    # column list and template decode, so it compares like-for-like with
+    # voter.lookup_cached.
+    load, ids = ctx["app"].voter_cache._load, ctx["voter_ids"]
+    return lambda: load(random.choice(ids))
+
+
+@bench("voter.lookup_cached")
+def _(ctx):
+    cache, ids = ctx["app"].voter_cache, ctx["voter_ids"][:1000]
+    for voter_id in ids:
+        cache.get(voter_id)
+    return lambda: cache.get(random.choice(ids))
+
+
+@bench("vote.insert")
+def _(ctx):
+    # Each call casts for a fresh voter; the run ends when the unvoted half runs out.
+    app, conn = ctx["app"], ctx["app"].get_conn()
+    fresh = iter(ctx["voter_ids"][len(ctx["voter_ids"]) // 2:])
+    return lambda: app.record_vote(conn, next(fresh), "Candidate A")
+
+
+# --- Pages ---
+def _render(ctx, template, **context):
+    app = ctx["app"]
+
+    def run():
+        with app.APP.test_request_context("/"):
+            app.render_template_string(template, **context)
+    return run
+
+
+@bench("render.index")
+def _(ctx):
+    app = ctx["app"]
+    return _render(ctx, app.INDEX_HTML, stream_fps=app.FACE_STREAM_FPS, stream_timeout_ms=4000,
+                   stream_short_side=app.FACE_STREAM_SHORT_SIDE)
+
+
+@bench("render.admin_login")
+def _(ctx):
+    return _render(ctx, ctx["app"].ADMIN_LOGIN_HTML)
+
+
+@bench("render.admin_add")
+def _(ctx):
+    return _render(ctx, ctx["app"].ADMIN_ADD_HTML)
+
+
+@bench("render.admin_edit")
+def _(ctx):
+    conn = ctx["app"].get_conn()
+    voter = conn.execute("SELECT * FROM voters LIMIT 1").fetchone()
+    return _render(ctx, ctx["app"].ADMIN_EDIT_HTML, voter=voter)
+
+
+@bench("render.admin_list_page")
+def _(ctx):
+    app = ctx["app"]
+
+    def run():
+        with app.APP.test_request_context("/admin/list"):
+            voters = app.iter_voter_page(app.ADMIN_PAGE_SIZE, None, None, 0)
+            "".join(app.stream_template_string(app.ADMIN_LIST_HTML, voters=voters, limit=app.ADMIN_PAGE_SIZE))
+    return run
+
+
+def measure(fn, min_time, max_calls):
+    """Per-call timings in seconds: a short warm-up, then calls until min_time or max_calls."""
+    for _ in range(3):
+        fn()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_calls and (len(samples) < 5 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        try:
+            fn()
+        except StopIteration:
+            break
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    app = load_app()
+    logging.disable(logging.WARNING)  # compare_faces logs every distance at INFO
+    random.seed(0)
+    images = load_image_corpus(args.images, args.image_count, (640, 480))
+    templates = [t for t in (app.detect_face_template(img) for img in images) if t is not None]
+    ctx = {"app": app, "images": images, "templates": templates,
+           "voter_ids": seed_voters(app, args.voters)}
+    pattern = re.compile(args.only) if args.only else None
+    results = {}
+    print(f"{'metric':>24} {'n':>7} {'p50 us':>10} {'p95 us':>10} {'mean us':>10}")
+    for name, factory in BENCHMARKS.items():
+        if pattern and not pattern.search(name):
+            continue
+        samples = measure(factory(ctx), args.min_time, args.max_calls)
+        results[name] = {"n": len(samples), "p50_us": percentile(samples, 50) * 1e6,
+                         "p95_us": percentile(samples, 95) * 1e6, "mean_us": sum(samples) / len(samples) * 1e6}
+        r = results[name]
+        print(f"{name:>24} {r['n']:7d} {r['p50_us']:10.1f} {r['p95_us']:10.1f} {r['mean_us']:10.1f}")
+    return {"meta": {"created": datetime.now(timezone.utc).isoformat(), "revision": git_revision(),
+                     "python": platform.python_version(), "machine": platform.machine(),
+                     "voters": args.voters, "images": len(images)},
+            "results": results}
+
+
+def compare(base, new, threshold):
+    """Prints median ratios new/base; returns the metrics that regressed beyond threshold."""
+    regressions = []
+    print(f"{'metric':>24} {'base p50 us':>12} {'new p50 us':>12} {'change':>8}")
+    for name, r in new["results"].items():
+        if name not in base["results"]:
+            print(f"{name:>24} {'-':>12} {r['p50_us']:12.1f} {'new':>8}")
+            continue
+        old = base["results"][name]["p50_us"]
+        change = r["p50_us"] / old - 1 if old else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:>24} {old:12.1f} {r['p50_us']:12.1f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run the suite and write JSON results.")
+    run.add_argument("--out", help="Write results to this JSON file.")
+    run.add_argument("--voters", type=int, default=10000, help="Rows in the generated database.")
+    run.add_argument("--images", help="Directory of JPEG/PNG frames (default: synthetic faces).")
+    run.add_argument("--image-count", type=int, default=16, help="Synthetic frames when --images is not given.")
+    run.add_argument("--only", help="Regex selecting metrics to run.")
+    run.add_argument("--min-time", type=float, default=0.5, help="Seconds per metric.")
+    run.add_argument("--max-calls", type=int, default=20000)
+    run.add_argument("--baseline", help="Compare against this results file after running.")
+    run.add_argument("--threshold", type=float, default=0.15)
+    cmp = sub.add_parser("compare", help="Compare two results files.")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        new = run_suite(args)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(new, f, indent=2)
+        if not args.baseline:
+            return
+        with open(args.baseline) as f:
+            base = json.load(f)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metric(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+    print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
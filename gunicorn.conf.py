@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for the voting app (picked up automatically from the
+working directory). Worker count and bind address come from the command line.
+"""
+import glob
+import os
+import tempfile
+
+# Threaded workers: face inference is admitted through app.inference_gate,
+# so the remaining threads stay free for cheap calls like /api/cast_vote.
+worker_class = "gthread"
+threads = int(os.environ.get("SVM_GUNICORN_THREADS", 4))
+
+
+def on_starting(server):
+    """Gives the workers a fresh shared directory for their Prometheus samples."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="svm_metrics_")
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):  # samples from a previous run
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def post_fork(server, worker):
+    """Booth workers start warming the face detector as soon as they fork."""
+    if os.environ.get("SVM_PROFILE", "booth") != "booth":
+        return
+    import app
+    app.start_warm_up()
+
+
+def child_exit(server, worker):
+    """Drops a dead worker's live-gauge files; its counters and histograms are kept."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)